@@ -1,13 +1,22 @@
 #!/usr/bin/env python3
 # app.py — LiverCare API (Enhanced: friendly labels, professional risk scale, true confidence)
 from flask import Flask, request, jsonify
-import os, time, json, hashlib, traceback
+import os, time, json, hmac, random, traceback
 import joblib
 import numpy as np
 import warnings
 from math import log
 warnings.filterwarnings("ignore")
 
+from training.calibration import apply_calibration
+from training.thresholds import load_thresholds
+from serving.admission import AdmissionController, DEGRADED_MODES
+from serving.audit_log import AuditLog
+from serving.tracing import SlowestTraces, Trace, annotate, span
+from serving.response import (
+    FastJSONProvider, HASH_MODES, explain_factor, explanation_text, food_recommendations, prediction_hash
+)
+
 # Optional SHAP import
 try:
     import shap
@@ -18,28 +27,121 @@ except Exception:
 
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
+app.json = FastJSONProvider(app)   # orjson when installed, NumPy types handled natively
 
 # ---------------- Config ----------------
 MODEL_DIR = os.environ.get("MODEL_DIR", "training_output")
 MODEL_PATH = os.path.join(MODEL_DIR, "best_hcv_model.pkl")
 ALT_MODEL_PATH = os.path.join(MODEL_DIR, "alt_model.pkl")
+CALIBRATION_PATH = os.path.join(MODEL_DIR, "calibration.json")
+STUDENT_MODEL_PATH = os.path.join(MODEL_DIR, "student_model.pkl")
+THRESHOLDS_PATH = os.path.join(MODEL_DIR, "thresholds.json")
+# Risk bands / second-opinion cut from liver_train.py's threshold tuning (TUNE_THRESHOLDS=1).
+# Opt-in: tuned bands change the risk labels returned to clinicians; 0 = built-in defaults
+USE_TUNED_THRESHOLDS = os.environ.get("USE_TUNED_THRESHOLDS", "0") == "1"
+# Serve the distilled student (liver_train.py with DISTILL_STUDENT=1) as the primary model
+USE_STUDENT_MODEL = os.environ.get("USE_STUDENT_MODEL", "0") == "1"
 SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
 FEATURE_ORDER_PATH = os.path.join(MODEL_DIR, "feature_order.pkl")
 LABEL_ENCODER_PATH = os.path.join(MODEL_DIR, "label_encoder.pkl")
 MODEL_VERSION = os.environ.get("MODEL_VERSION", "v1.0")
+# "binary" = SHA-256 over a fixed binary layout, "json" = previous JSON-based hash
+HASH_MODE = os.environ.get("HASH_MODE", "binary").lower()
+if HASH_MODE not in HASH_MODES:
+    raise ValueError(f"HASH_MODE must be one of {HASH_MODES}, got {HASH_MODE!r}")
+
+# Server: "dev" = Flask development server, "prefork" = serving/launcher.py
+SERVER_MODE = os.environ.get("SERVER_MODE", "dev").lower()
+PORT = int(os.environ.get("PORT", "5000"))
+PREFORK_WORKERS = os.environ.get("PREFORK_WORKERS", "auto")   # "auto" = CPU count
+MEMORY_REPORT_INTERVAL = float(os.environ.get("MEMORY_REPORT_INTERVAL", "60"))
+
+# Admission control / load shedding for /api/predict (see serving/admission.py)
+MAX_CONCURRENT_PREDICTIONS = int(os.environ.get("MAX_CONCURRENT_PREDICTIONS", "4"))
+MAX_PREDICTION_QUEUE = int(os.environ.get("MAX_PREDICTION_QUEUE", "16"))
+PREDICTION_QUEUE_TIMEOUT = float(os.environ.get("PREDICTION_QUEUE_TIMEOUT", "5"))
+# Degradation ladder: queue depth / recent latency (seconds) at which each step kicks in
+DEGRADE_FAST_FACTORS_QUEUE = int(os.environ.get("DEGRADE_FAST_FACTORS_QUEUE", "2"))
+DEGRADE_NO_ALT_QUEUE = int(os.environ.get("DEGRADE_NO_ALT_QUEUE", "8"))
+DEGRADE_FAST_FACTORS_LATENCY = float(os.environ.get("DEGRADE_FAST_FACTORS_LATENCY", "0.5"))
+DEGRADE_NO_ALT_LATENCY = float(os.environ.get("DEGRADE_NO_ALT_LATENCY", "1.5"))
+# Seconds for the recent-latency signal to halve while no request completes
+DEGRADE_LATENCY_HALF_LIFE = float(os.environ.get("DEGRADE_LATENCY_HALF_LIFE", "10"))
+
+# Prediction audit log (see serving/audit_log.py); AUDIT_LOG_DIR="" disables it.
+# The segments hold patient ids and lab values unencrypted: keep the directory out of
+# version control (audit_log/ is in .gitignore) and point it at protected storage
+AUDIT_LOG_DIR = os.environ.get("AUDIT_LOG_DIR", "audit_log")
+AUDIT_RING_SIZE = int(os.environ.get("AUDIT_RING_SIZE", "100000"))
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "2000"))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", "0.5"))
+AUDIT_SEGMENT_MB = float(os.environ.get("AUDIT_SEGMENT_MB", "64"))
+AUDIT_MAX_SEGMENTS = int(os.environ.get("AUDIT_MAX_SEGMENTS", "0")) or None   # 0 = keep all
+AUDIT_FSYNC = os.environ.get("AUDIT_FSYNC", "interval").lower()             # always|interval|never
+AUDIT_FSYNC_INTERVAL = float(os.environ.get("AUDIT_FSYNC_INTERVAL", "5"))
+
+# Per-request tracing (see serving/tracing.py). Admins send X-Admin-Token plus
+# X-Trace: 1|profile (or ?trace=1|profile) to get a span tree in the response.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")             # empty = trace mode disabled
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))   # background sampling
+TRACE_KEEP_SLOWEST = int(os.environ.get("TRACE_KEEP_SLOWEST", "20"))
 
 # ---------------- Load artifacts ----------------
 if not os.path.exists(MODEL_PATH):
     raise FileNotFoundError(f"Model not found at {MODEL_PATH}")
 
-best_model = joblib.load(MODEL_PATH)
+if USE_STUDENT_MODEL and os.path.exists(STUDENT_MODEL_PATH):
+    best_model = joblib.load(STUDENT_MODEL_PATH)
+    print("✅ Serving distilled student model:", STUDENT_MODEL_PATH)
+else:
+    if USE_STUDENT_MODEL:
+        print("⚠ USE_STUDENT_MODEL=1 but no student found; serving", MODEL_PATH)
+    best_model = joblib.load(MODEL_PATH)
 alt_model = joblib.load(ALT_MODEL_PATH) if os.path.exists(ALT_MODEL_PATH) else None
 scaler = joblib.load(SCALER_PATH) if os.path.exists(SCALER_PATH) else None
 feature_order = joblib.load(FEATURE_ORDER_PATH) if os.path.exists(FEATURE_ORDER_PATH) else None
 label_encoder = joblib.load(LABEL_ENCODER_PATH) if os.path.exists(LABEL_ENCODER_PATH) else None
 
+# Single-model calibration (liver_train.py CALIBRATION_MODE=sigmoid|isotonic).
+# The mapping belongs to best_hcv_model.pkl, so it is not applied to the student.
+calibration_mapping = None
+if os.path.exists(CALIBRATION_PATH) and not (USE_STUDENT_MODEL and os.path.exists(STUDENT_MODEL_PATH)):
+    with open(CALIBRATION_PATH) as f:
+        calibration_mapping = json.load(f)
+    print("✅ Calibration mapping loaded:", calibration_mapping.get("method"))
+
+RISK_BANDS, SECOND_OP_THRESHOLD = load_thresholds(THRESHOLDS_PATH if USE_TUNED_THRESHOLDS else None)
+if USE_TUNED_THRESHOLDS and os.path.exists(THRESHOLDS_PATH):
+    print("✅ Tuned thresholds loaded:", RISK_BANDS, "| second opinion below", SECOND_OP_THRESHOLD)
+
 print("✅ Artifacts loaded. Feature order:", feature_order)
 
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_PREDICTIONS,
+    max_queue=MAX_PREDICTION_QUEUE,
+    queue_timeout=PREDICTION_QUEUE_TIMEOUT,
+    fast_factors_queue=DEGRADE_FAST_FACTORS_QUEUE,
+    no_alt_queue=DEGRADE_NO_ALT_QUEUE,
+    fast_factors_latency=DEGRADE_FAST_FACTORS_LATENCY,
+    no_alt_latency=DEGRADE_NO_ALT_LATENCY,
+    ewma_half_life=DEGRADE_LATENCY_HALF_LIFE,
+)
+
+audit_log = None
+if AUDIT_LOG_DIR:
+    audit_log = AuditLog(
+        AUDIT_LOG_DIR,
+        ring_size=AUDIT_RING_SIZE,
+        batch_size=AUDIT_BATCH_SIZE,
+        flush_interval=AUDIT_FLUSH_INTERVAL,
+        segment_bytes=int(AUDIT_SEGMENT_MB * 1024 * 1024),
+        max_segments=AUDIT_MAX_SEGMENTS,
+        fsync=AUDIT_FSYNC,
+        fsync_interval=AUDIT_FSYNC_INTERVAL,
+    ).register_atexit()
+
+slowest_traces = SlowestTraces(TRACE_KEEP_SLOWEST)
+
 # SHAP lazy init
 _shap_explainer = None
 _shap_last_init = 0
@@ -55,7 +157,7 @@ def get_shap_explainer():
         def model_predict(X):
             Xs = scaler.transform(X)
             if hasattr(best_model, "predict_proba"):
-                return best_model.predict_proba(Xs)
+                return predict_primary_proba(Xs)
             try:
                 df = best_model.decision_function(Xs)
                 if df.ndim == 1:
@@ -64,7 +166,8 @@ def get_shap_explainer():
                 return df
             except:
                 return np.zeros((X.shape[0],2))
-        _shap_explainer = shap.Explainer(model_predict, masker)
+        with span("shap.init"):
+            _shap_explainer = shap.Explainer(model_predict, masker)
         print("SHAP explainer initialized.")
         return _shap_explainer
     except Exception as e:
@@ -112,44 +215,19 @@ def shap_support_strength(shap_vals):
     except:
         return 0.5
 
-def interpret_factor(feature, impact, disease_flag):
-    try:
-        impact = float(impact)
-        strength = abs(impact)
-
-        if strength > 0.5:
-            level = "strongly"
-        elif strength > 0.2:
-            level = "moderately"
-        else:
-            level = "slightly"
-
-        if disease_flag:
-            if impact > 0:
-                trend = "increased the likelihood of liver disease"
-            else:
-                trend = "reduced the likelihood of liver disease (protective effect)"
-        else:
-            if impact > 0:
-                trend = "helped the model stay confident there is no liver disease (protective effect)"
-            else:
-                trend = "pushed the model slightly towards liver disease but not enough to change the final decision"
-
-        return f"{feature} {level} {trend} (impact: {impact:.3f})"
-    except Exception:
-        return f"{feature} impact {impact}"
-
-def compute_top_factors(X_np, disease_flag):
+def compute_top_factors(X_np, disease_flag, use_shap=True):
     try:
         X_np = np.asarray(X_np)
         if X_np.ndim == 1:
             X_np = X_np.reshape(1, -1)
     except:
         return []
-    explainer = get_shap_explainer()
+    # under load (use_shap=False) go straight to the cheap scaler-based fallback
+    explainer = get_shap_explainer() if use_shap else None
     if explainer is not None:
         try:
-            ev = explainer(X_np)
+            with span("shap.explain"):
+                ev = explainer(X_np)
             vals = getattr(ev, "values", None) or getattr(ev, "shap_values", None)
             if vals is None:
                 raise RuntimeError("No shap values")
@@ -160,25 +238,29 @@ def compute_top_factors(X_np, disease_flag):
             shap_vals = vals_arr.reshape(1, -1)[0]
             pairs = list(zip(feature_order, shap_vals))
             top = sorted(pairs, key=lambda x: abs(x[1]), reverse=True)[:3]
+            annotate(path="shap")
             return [
                 {
                     "feature": f,
                     "impact": float(v),
-                    "explanation": interpret_factor(f, v, disease_flag)
+                    "explanation": explain_factor(f, v, disease_flag)
                 }
                 for f, v in top
             ]
         except Exception as e:
             print("SHAP computation failed:", e)
+            annotate(shap_error=str(e))
     try:
-        Xs = scaler.transform(X_np)
-        vals = Xs.squeeze()
-        idxs = np.argsort(np.abs(vals))[::-1][:3]
+        with span("factors.fallback"):
+            Xs = scaler.transform(X_np)
+            vals = Xs.squeeze()
+            idxs = np.argsort(np.abs(vals))[::-1][:3]
+        annotate(path="fallback")
         return [
             {
                 "feature": feature_order[i],
                 "impact": float(vals[i]),
-                "explanation": interpret_factor(feature_order[i], vals[i], disease_flag)
+                "explanation": explain_factor(feature_order[i], vals[i], disease_flag)
             }
             for i in idxs
         ]
@@ -197,35 +279,122 @@ def get_class_index_for_value(model, value=1):
             pass
     return 1
 
+def predict_primary_proba(Xs):
+    probs = best_model.predict_proba(Xs)
+    if calibration_mapping is None:
+        return probs
+    # cheap post-processing: map the disease column, keep rows summing to 1
+    idx = get_class_index_for_value(best_model, 1)
+    p = apply_calibration(calibration_mapping, probs[:, idx])
+    probs = np.array(probs, dtype=float)
+    probs[:, idx] = p
+    probs[:, 1 - idx] = 1.0 - p
+    return probs
+
 def compute_risk_label(pred_index, disease_prob):
     pred_label = LABEL_MAP.get(pred_index, str(pred_index))
     if pred_index == 0:
         healthy_prob = 1.0 - disease_prob
-        if healthy_prob > 0.85:
+        if healthy_prob > RISK_BANDS["healthy_low"]:
             return "Low"
-        if healthy_prob >= 0.60:
+        if healthy_prob >= RISK_BANDS["healthy_medium"]:
             return "Medium"
         return "Borderline"
     else:
-        if disease_prob < 0.50:
+        if disease_prob < RISK_BANDS["disease_mild"]:
             return "Borderline"
-        if disease_prob < 0.70:
+        if disease_prob < RISK_BANDS["disease_moderate"]:
             return "Mild"
-        if disease_prob < 0.90:
+        if disease_prob < RISK_BANDS["disease_high"]:
             return "Moderate"
         return "High"
 
 # ---------------- Routes ----------------
 @app.route("/", methods=["GET"])
 def root():
-    return jsonify({"message": "LiverCare API running", "model_version": MODEL_VERSION}), 200
+    return jsonify({
+        "message": "LiverCare API running",
+        "model_version": MODEL_VERSION,
+        "risk_bands": RISK_BANDS,
+        "second_opinion_threshold": SECOND_OP_THRESHOLD,
+        "admission": admission.stats(),
+        "audit_log": audit_log.stats() if audit_log is not None else None
+    }), 200
+
+def requested_trace_mode():
+    """None, "trace" or "profile" from the X-Trace header or ?trace= query flag."""
+    flag = (request.headers.get("X-Trace") or request.args.get("trace") or "").strip().lower()
+    if flag == "profile":
+        return "profile"
+    if flag in ("1", "true", "yes", "on"):
+        return "trace"
+    return None
+
+def is_admin():
+    supplied = request.headers.get("X-Admin-Token", "")
+    # bytes: compare_digest raises TypeError on non-ASCII str
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(
+        supplied.encode("utf-8", "surrogateescape"), ADMIN_TOKEN.encode("utf-8", "surrogateescape")
+    )
+
+@app.route("/api/admin/traces", methods=["GET"])
+def admin_traces():
+    if not is_admin():
+        return jsonify({"success": False, "error": "Admin token required."}), 403
+    traces = slowest_traces.snapshot()
+    if request.args.get("clear") == "1":
+        slowest_traces.clear()
+    # per process: under the prefork launcher each worker keeps its own buffer
+    return jsonify({
+        "success": True,
+        "pid": os.getpid(),
+        "capacity": slowest_traces.capacity,
+        "offered": slowest_traces.offered,
+        "traces": traces
+    }), 200
 
 @app.route("/api/predict", methods=["POST"])
 def api_predict():
+    trace_mode = requested_trace_mode()
+    if trace_mode is not None and not is_admin():
+        return jsonify({"success": False, "error": "Trace mode is restricted to admins."}), 403
+    sampled = trace_mode is None and TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+    if trace_mode is None and not sampled:
+        return admitted_predict()
+
+    with Trace("api_predict", profile=(trace_mode == "profile")) as trace:
+        resp, status = admitted_predict()
+    slowest_traces.offer(trace)
+    if trace_mode is not None:
+        body = resp.get_json()
+        body["trace"] = trace.to_dict()
+        resp.set_data(app.json.dumps(body))
+    return resp, status
+
+def admitted_predict():
+    with span("admission.acquire"):
+        ticket = admission.acquire()
+    if ticket is None:
+        resp = jsonify({
+            "success": False,
+            "error": "Prediction service overloaded, please retry later.",
+            "degraded_mode": "rejected"
+        })
+        resp.headers["Retry-After"] = str(admission.retry_after())
+        return resp, 503
+    try:
+        annotate(degraded_mode=DEGRADED_MODES[ticket.level])
+        return predict_with_level(ticket.level)
+    finally:
+        admission.release(ticket)
+
+def predict_with_level(degrade_level):
+    t_start = time.perf_counter()
     try:
         data = request.get_json(force=True, silent=True)
         if not data:
-            return jsonify({"success": False, "error": "Invalid JSON"}), 400
+            return jsonify({"success": False, "error": "Invalid JSON",
+                            "degraded_mode": DEGRADED_MODES[degrade_level]}), 400
 
         # build feature vector from feature_order
         missing = []
@@ -257,13 +426,15 @@ def api_predict():
             if str(feat).lower() in ["gender", "sex"]:
                 g = normalize_gender(raw)
                 if g is None:
-                    return jsonify({"success": False, "error": f"Invalid gender value for {feat}: {raw}"}), 400
+                    return jsonify({"success": False, "error": f"Invalid gender value for {feat}: {raw}",
+                                    "degraded_mode": DEGRADED_MODES[degrade_level]}), 400
                 x_vals.append(float(g))
             else:
                 try:
                     x_vals.append(float(raw))
                 except Exception:
-                    return jsonify({"success": False, "error": f"Field {feat} must be numeric. Got: {raw}"}), 400
+                    return jsonify({"success": False, "error": f"Field {feat} must be numeric. Got: {raw}",
+                                    "degraded_mode": DEGRADED_MODES[degrade_level]}), 400
 
         if missing:
             ag_keys = ["A/G Ratio","A_G","AG_Ratio","AGRatio","A_G_Ratio"]
@@ -285,17 +456,20 @@ def api_predict():
                         pass
 
         if missing:
-            return jsonify({"success": False, "error": f"Missing required fields: {missing}"}), 400
+            return jsonify({"success": False, "error": f"Missing required fields: {missing}",
+                            "degraded_mode": DEGRADED_MODES[degrade_level]}), 400
 
         X = np.array(x_vals).reshape(1, -1)
-        if scaler is not None:
-            Xs = scaler.transform(X)
-        else:
-            Xs = X
+        with span("scale"):
+            if scaler is not None:
+                Xs = scaler.transform(X)
+            else:
+                Xs = X
 
         # Primary prediction
         if hasattr(best_model, "predict_proba"):
-            probs = best_model.predict_proba(Xs)[0]
+            with span("model.primary"):
+                probs = predict_primary_proba(Xs)[0]
         else:
             try:
                 df_val = best_model.decision_function(Xs)[0]
@@ -319,7 +493,8 @@ def api_predict():
         risk_label = compute_risk_label(pred_idx, disease_prob)
         disease_flag = (pred_idx == 1)
 
-        top_factors = compute_top_factors(X, disease_flag)
+        with span("top_factors", use_shap=(degrade_level == 0)):
+            top_factors = compute_top_factors(X, disease_flag, use_shap=(degrade_level == 0))
         entropy_uncertainty = calculate_entropy(probs)
         entropy_confidence = 1 - entropy_uncertainty
 
@@ -327,11 +502,11 @@ def api_predict():
         secondary_conf = None
         secondary_probs = None
         second_opinion_obj = None
-        SECOND_OP_THRESHOLD = 0.70
-        if primary_conf < SECOND_OP_THRESHOLD and alt_model is not None:
+        if primary_conf < SECOND_OP_THRESHOLD and alt_model is not None and degrade_level < 2:
             try:
                 if hasattr(alt_model, "predict_proba"):
-                    secondary_probs = alt_model.predict_proba(Xs)[0]
+                    with span("model.alt"):
+                        secondary_probs = alt_model.predict_proba(Xs)[0]
                 else:
                     try:
                         df_val2 = alt_model.decision_function(Xs)[0]
@@ -376,7 +551,7 @@ def api_predict():
         # Medical warning: low confidence AND/OR contradiction
         medical_warning = None
 
-        # 1) Both confidences < 0.70
+        # 1) Both confidences < SECOND_OP_THRESHOLD
         if primary_conf < SECOND_OP_THRESHOLD:
             if secondary_conf is None:
                 medical_warning = None
@@ -397,50 +572,12 @@ def api_predict():
                         "This indicates uncertainty. Please consult a doctor or medical expert before making any decisions."
                     )
 
-        # Food recommendations
-        FOOD_RECOMMENDATIONS = {
-            "liver_friendly": [
-                "Leafy greens (spinach, kale)",
-                "High-fiber whole grains (oats, brown rice)",
-                "Lean proteins (chicken, fish)",
-                "Fresh fruits (berries, apples)",
-                "Healthy fats (olive oil, avocados)"
-            ],
-            "avoid": [
-                "Alcohol",
-                "High-fat fried foods",
-                "Sugary beverages and sweets",
-                "Processed meats",
-                "Excess salt"
-            ],
-            "notes": "General guidelines. Consult a medical professional for personalized advice."
-        }
-        food_recs = FOOD_RECOMMENDATIONS if disease_flag else {"note": "No disease predicted — general healthy diet recommended."}
+        # Food recommendations (constant, built once in serving/response.py)
+        food_recs = food_recommendations(disease_flag)
 
-        payload_for_hash = {
-            "patient_id": data.get("patient_id", ""),
-            "features": dict(zip(feature_order, [float(x) for x in x_vals])),
-            "predicted_label": pred_label_str,
-            "disease_probability": disease_prob
-        }
-        payload_hash = hashlib.sha256(json.dumps(payload_for_hash, sort_keys=True).encode()).hexdigest()
-
-        if disease_flag:
-            summary_prefix = (
-                f"The model predicted Liver Disease with a {risk_label} risk and "
-                f"{primary_conf*100:.2f}% confidence. "
-                f"The following factors contributed towards liver disease in this case: "
-            )
-        else:
-            summary_prefix = (
-                f"The model predicted No Liver Disease with a {risk_label} risk level and "
-                f"{primary_conf*100:.2f}% confidence. "
-                f"The following factors helped the model stay confident that there is no liver disease: "
-            )
-
-        explanation_text = summary_prefix + " ".join(
-            [t.get("explanation", "") for t in top_factors]
-        )
+        patient_id = data.get("patient_id", "")
+        with span("hash", mode=HASH_MODE):
+            payload_hash = prediction_hash(HASH_MODE, patient_id, feature_order, x_vals, pred_label_str, disease_prob)
 
         response = {
             "success": True,
@@ -450,7 +587,7 @@ def api_predict():
             "disease_probability": disease_prob,
             "risk_level": risk_label,
             "top_factors": top_factors,
-            "explanation_text": explanation_text,
+            "explanation_text": explanation_text(disease_flag, risk_label, primary_conf, top_factors),
             "confidence_original": primary_conf,
             "confidence_entropy_adjusted": entropy_confidence,
             "confidence_model_agreement": agreement,
@@ -460,16 +597,47 @@ def api_predict():
             "medical_warning": medical_warning,
             "food_recommendations": food_recs,
             "model_version": MODEL_VERSION,
-            "hash": payload_hash
+            "degraded_mode": DEGRADED_MODES[degrade_level],
+            "hash": payload_hash,
+            "hash_mode": HASH_MODE
         }
 
+        if audit_log is not None:
+            # only queues a dict; serialisation and disk I/O happen on the writer thread
+            audit_log.record({
+                "ts": time.time(),
+                "patient_id": patient_id,
+                "features": dict(zip(feature_order, x_vals)),
+                "prediction": pred_label_str,
+                "disease_probability": disease_prob,
+                "probability_primary": primary_conf,
+                "risk_level": risk_label,
+                "second_opinion": second_opinion_obj.get("prediction") if second_opinion_obj else None,
+                "degraded_mode": DEGRADED_MODES[degrade_level],
+                "model_version": MODEL_VERSION,
+                "hash": payload_hash,
+                "hash_mode": HASH_MODE,
+                "latency_ms": round((time.perf_counter() - t_start) * 1000.0, 3),
+            })
+
         return jsonify(response), 200
 
     except Exception as e:
         tb = traceback.format_exc()
         print("Prediction Error:", e, tb)
-        return jsonify({"success": False, "error": str(e), "trace": tb}), 500
+        return jsonify({"success": False, "error": str(e), "trace": tb,
+                        "degraded_mode": DEGRADED_MODES[degrade_level]}), 500
 
 if __name__ == "__main__":
-    print("Starting LiverCare API on port 5000 (model_version:", MODEL_VERSION, ")")
-    app.run(host="0.0.0.0", port=5000)
+    if SERVER_MODE == "prefork":
+        # models are already loaded in this (master) process; SHAP is warmed before forking
+        from serving.launcher import serve_prefork
+        print("Starting LiverCare API (prefork) on port", PORT, "(model_version:", MODEL_VERSION, ")")
+        serve_prefork(
+            app, host="0.0.0.0", port=PORT, workers=PREFORK_WORKERS,
+            warmup=get_shap_explainer, report_interval=MEMORY_REPORT_INTERVAL,
+            on_worker_exit=audit_log.close if audit_log is not None else None
+        )
+    else:
+        print("Starting LiverCare API on port", PORT, "(model_version:", MODEL_VERSION, ")")
+        app.run(host="0.0.0.0", port=PORT)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+generate_synthetic_lpd.py
+
+Synthetic Liver Patient Dataset (LPD) generator for load and scaling tests.
+- Reads the real LPD CSV with the same encoding fallback, column mapping and cleaning
+  as liver_train.py (training/lpd_data.py)
+- Fits the joint distribution of the features per class with a Gaussian copula:
+  empirical marginals (quantile grids) + correlation of normal scores, plus the class
+  prior and per-column missing rates
+- Streams arbitrarily many rows to CSV (or Parquet when pyarrow is installed) chunk by
+  chunk, so memory stays bounded at any row count
+- Reproducible from --seed (for the same --chunk-rows)
+- Messy on purpose, like the real exports: header name variants (incl. non-breaking
+  spaces), selectable file encoding, Gender spelled Male/M/f/" male ", blank/"?" values
+
+Usage:
+    python generate_synthetic_lpd.py --rows 10000000 --out synthetic_lpd_10M.csv --seed 7
+    python generate_synthetic_lpd.py --rows 1000000 --format parquet --out synthetic_lpd.parquet
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from training.lpd_data import read_csv_any_encoding, standardize_columns, clean_frame
+
+DATA_FILE = "Liver Patient Dataset (LPD)_train.csv"
+QUANTILE_POINTS = 1024
+COLUMNS = ['Age', 'Gender', 'TB', 'DB', 'Alkphos', 'Sgpt', 'Sgot', 'TP', 'ALB', 'A_G']
+
+# Header variants per column; every set is recognised by training/lpd_data.map_columns
+# and keeps the feature set liver_train.py gets from the real file.
+HEADER_VARIANTS = [
+    {   # as exported in the original LPD (non-breaking spaces included)
+        'Age': "Age of the patient", 'Gender': "Gender of the patient",
+        'TB': "Total Bilirubin", 'DB': "Direct Bilirubin",
+        'Alkphos': "\xa0Alkphos Alkaline Phosphotase", 'Sgpt': "\xa0Sgpt Alamine Aminotransferase",
+        'Sgot': "Sgot Aspartate Aminotransferase", 'TP': "Total Protiens",
+        'ALB': "\xa0ALB Albumin", 'A_G': "A/G Ratio Albumin and Globulin Ratio", 'Result': "Result",
+    },
+    {   # short names
+        'Age': "Age", 'Gender': "Gender", 'TB': "Total Bilirubin", 'DB': "Direct Bilirubin",
+        'Alkphos': "Alkphos", 'Sgpt': "Sgpt", 'Sgot': "Sgot", 'TP': "TP",
+        'ALB': "ALB", 'A_G': "A/G Ratio", 'Result': "Result",
+    },
+    {   # lower-case / ILPD-style names
+        'Age': " age ", 'Gender': "gender", 'TB': "total_bilirubin", 'DB': "direct_bilirubin",
+        'Alkphos': "alkaline_phosphotase", 'Sgpt': "sgpt_alamine_aminotransferase",
+        'Sgot': "aspartate_aminotransferase", 'TP': "total_protiens", 'ALB': "albumin",
+        'A_G': "ag_ratio", 'Result': "selector",
+    },
+]
+
+GENDER_SPELLINGS = {
+    1: ["Male", "M", "m", "male", " Male ", "MALE"],
+    0: ["Female", "F", "f", "female", " Female ", "FEMALE"],
+}
+MISSING_SPELLINGS = ["", "?", "NA", "nan"]
+
+
+# ---------------- Fitting ----------------
+def _locate(df, key):
+    """Standard column name, falling back to the bilirubin headers map_columns misses."""
+    if key in df.columns:
+        return key
+    words = {'TB': ("total", "bilirubin"), 'DB': ("direct", "bilirubin")}.get(key)
+    if words:
+        for c in df.columns:
+            if all(w in c.lower() for w in words):
+                return c
+    return None
+
+
+def _decimals(values):
+    """Number of decimals the real data is recorded with (0..3)."""
+    for d in range(4):
+        if np.allclose(values, np.round(values, d)):
+            return d
+    return 3
+
+
+def fit_copula(path=DATA_FILE):
+    print("📥 Fitting synthetic LPD model on:", path)
+    df = read_csv_any_encoding(path)
+    df, _ = standardize_columns(df)
+    df = clean_frame(df)
+
+    columns = [k for k in COLUMNS if _locate(df, k) is not None]
+    X = pd.DataFrame({k: pd.to_numeric(df[_locate(df, k)], errors='coerce') for k in columns})
+    y = df['Category'].to_numpy()
+    grid = np.linspace(0.0, 1.0, QUANTILE_POINTS)
+
+    model = {"columns": columns, "prior": float(np.mean(y == 1)), "classes": {}}
+    model["decimals"] = {k: _decimals(X[k].dropna().to_numpy()) for k in columns}
+    for cls in (0, 1):
+        Xc = X[y == cls]
+        quantiles, missing, scores = {}, {}, []
+        for k in columns:
+            v = Xc[k]
+            missing[k] = float(v.isna().mean())
+            quantiles[k] = np.quantile(v.dropna().to_numpy(), grid)
+            # normal scores of the ranks; missing values sit at the median (score 0)
+            ranks = v.rank(method="average").to_numpy()
+            n = v.notna().sum()
+            scores.append(np.where(np.isnan(ranks), 0.0, ndtri(ranks / (n + 1))))
+        corr = np.corrcoef(np.vstack(scores))
+        corr = np.nan_to_num(corr, nan=0.0)
+        np.fill_diagonal(corr, 1.0)
+        # nearest positive definite matrix for the Cholesky factor
+        w, V = np.linalg.eigh(corr)
+        corr = (V * np.maximum(w, 1e-6)) @ V.T
+        d = np.sqrt(np.diag(corr))
+        corr = corr / np.outer(d, d)
+        model["classes"][cls] = {
+            "chol": np.linalg.cholesky(corr),
+            "quantiles": quantiles,
+            "missing": missing,
+        }
+    print(f"   columns: {columns} | disease prior: {model['prior']:.3f} | rows fitted: {len(X)}")
+    return model
+
+
+# ---------------- Sampling ----------------
+def sample_chunk(model, n, rng, grid=np.linspace(0.0, 1.0, QUANTILE_POINTS)):
+    """Clean numeric chunk: standard column names + Result (1 disease / 2 no disease)."""
+    columns = model["columns"]
+    y = (rng.random(n) < model["prior"]).astype(int)
+    out = np.empty((n, len(columns)))
+    for cls in (0, 1):
+        idx = np.flatnonzero(y == cls)
+        if len(idx) == 0:
+            continue
+        params = model["classes"][cls]
+        z = rng.standard_normal((len(idx), len(columns))) @ params["chol"].T
+        u = ndtr(z)
+        for j, k in enumerate(columns):
+            col = np.interp(u[:, j], grid, params["quantiles"][k])
+            col = np.round(col, model["decimals"][k])
+            col[rng.random(len(idx)) < params["missing"][k]] = np.nan
+            out[idx, j] = col
+    frame = pd.DataFrame(out, columns=columns)
+    # integer-valued lab columns are written without a trailing ".0", like the real export
+    for k in columns:
+        if k != 'Gender' and model["decimals"][k] == 0:
+            frame[k] = frame[k].astype("Int64")
+    frame['Result'] = np.where(y == 1, 1, 2)
+    return frame
+
+
+def make_messy(frame, rng, messy_rate):
+    """Raw-export look: Gender as strings in assorted spellings, blanks/'?' for missing."""
+    n = len(frame)
+    gender = frame['Gender'].to_numpy(dtype=float) if 'Gender' in frame.columns else None
+    frame = frame.astype(object)
+    if gender is not None:
+        clean = np.where(np.isnan(gender), None, np.where(gender >= 0.5, "Male", "Female"))
+        variant = rng.random(n) < messy_rate
+        for i in np.flatnonzero(variant & (clean != None)):  # noqa: E711
+            choices = GENDER_SPELLINGS[1 if clean[i] == "Male" else 0]
+            clean[i] = choices[rng.integers(len(choices))]
+        frame['Gender'] = clean
+    for k in frame.columns:
+        if k == 'Result':
+            continue
+        col = frame[k].to_numpy(copy=True)
+        na = pd.isna(col)
+        if na.any():
+            spell = np.array(MISSING_SPELLINGS, dtype=object)[rng.integers(len(MISSING_SPELLINGS), size=na.sum())]
+            col[na] = spell
+            frame[k] = col
+    return frame
+
+
+# ---------------- Writers ----------------
+class CsvSink:
+    def __init__(self, path, header, encoding):
+        self.f = open(path, "w", encoding=encoding, errors="replace", newline="")
+        self.header = header
+
+    def write(self, frame):
+        frame.to_csv(self.f, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.f.close()
+
+
+class ParquetSink:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow).")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.writer = None
+
+    def write(self, frame):
+        # Parquet columns are typed: numeric columns stay float (missing -> null),
+        # Gender stays a string column with its messy spellings
+        frame = frame.copy()
+        for c in frame.columns:
+            if c != 'Result' and not c.lower().strip().startswith('gender'):
+                frame[c] = pd.to_numeric(frame[c], errors='coerce')
+        table = self.pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def generate(model, out_path, rows, seed=42, chunk_rows=200_000, fmt="csv",
+             encoding="utf-8", header_variant=None, messy_rate=0.02):
+    seq = np.random.SeedSequence(seed)
+    header_rng = np.random.default_rng(seq.spawn(1)[0])
+    if header_variant is None:
+        header_variant = int(header_rng.integers(len(HEADER_VARIANTS)))
+    names = HEADER_VARIANTS[header_variant]
+    columns = model["columns"] + ['Result']
+
+    sink = ParquetSink(out_path) if fmt == "parquet" else CsvSink(out_path, True, encoding)
+    print(f"🧪 Writing {rows} synthetic rows to {out_path} "
+          f"(format={fmt}, encoding={encoding}, header variant={header_variant}, seed={seed})")
+    start = time.time()
+    written = 0
+    n_chunks = (rows + chunk_rows - 1) // chunk_rows
+    try:
+        for i, child in enumerate(seq.spawn(n_chunks + 1)[1:]):
+            rng = np.random.default_rng(child)
+            n = min(chunk_rows, rows - written)
+            frame = sample_chunk(model, n, rng)
+            frame = make_messy(frame, rng, messy_rate)
+            frame = frame[columns].rename(columns=names)
+            sink.write(frame)
+            written += n
+            if (i + 1) % 10 == 0 or written == rows:
+                rate = written / max(time.time() - start, 1e-9)
+                print(f"   {written}/{rows} rows ({rate:,.0f} rows/s)")
+                sys.stdout.flush()
+    finally:
+        sink.close()
+    print("✅ Done:", out_path, f"{os.path.getsize(out_path) / 1e6:.1f} MB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic LPD-like data at any scale.")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--out", default="synthetic_lpd.csv")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--source", default=DATA_FILE, help="real LPD CSV to fit on")
+    ap.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    ap.add_argument("--encoding", default="utf-8",
+                    help="CSV encoding, e.g. utf-8, utf-8-sig, latin1, cp1252")
+    ap.add_argument("--header-variant", type=int, choices=range(len(HEADER_VARIANTS)), default=None,
+                    help="column-name variant (default: picked from the seed)")
+    ap.add_argument("--messy-rate", type=float, default=0.02,
+                    help="share of Gender values written in non-standard spellings")
+    ap.add_argument("--chunk-rows", type=int, default=200_000)
+    args = ap.parse_args()
+
+    model = fit_copula(args.source)
+    generate(
+        model, args.out, args.rows, seed=args.seed, chunk_rows=args.chunk_rows,
+        fmt=args.format, encoding=args.encoding, header_variant=args.header_variant,
+        messy_rate=args.messy_rate
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -6,18 +6,31 @@ Training pipeline for the Liver Patient Dataset (LPD).
 - Reads CSV with encoding fallback
 - Maps Result: 1 -> disease (1), 2 -> no disease (0)
 - Keeps Gender (maps Male->1 Female->0)
-- Imputes medians, SMOTE on train, RobustScaler
+- Imputes medians, SMOTE on train (or another IMBALANCE_STRATEGY), RobustScaler
 - Trains multiple models, calibrates, selects best model by test accuracy
+  (CALIBRATION_MODE=ensemble: CalibratedClassifierCV(cv=3), three model copies;
+   CALIBRATION_MODE=sigmoid|isotonic: one base model + calibration.json mapping)
 - Saves artifacts for Flask/PHP:
     training_output/best_hcv_model.pkl
     training_output/alt_model.pkl   (second-best model; optional)
+    training_output/calibration.json         (only with CALIBRATION_MODE=sigmoid|isotonic)
+    training_output/calibration_report.json  (only with CALIBRATION_MODE=sigmoid|isotonic)
     training_output/scaler.pkl
     training_output/label_encoder.pkl
     training_output/feature_order.pkl
     training_output/label_mapping.json
     training_output/model_test_results.csv
     training_output/test_data_sample.csv
+    training_output/student_model.pkl    (only with DISTILL_STUDENT=1 and an accepted student)
+    training_output/distill_report.json  (only with DISTILL_STUDENT=1)
+    training_output/oos_scores.npz       (tuning-split labels + disease probabilities; TUNE_THRESHOLDS=1)
+    training_output/thresholds.json      (tuned risk bands / second-opinion cut; TUNE_THRESHOLDS=1)
+- TUNE_THRESHOLDS=1 holds out a tuning split and DISTILL_STUDENT=1 a student validation split
+  from the training rows (neither is used for training or model selection); both drop their
+  exact duplicates of training rows
 - Produces a PDF & confusion matrices
+- OUT_OF_CORE=1: chunked variant for inputs larger than RAM, producing the same artifacts
+  (see training/out_of_core.py)
 """
 import os
 import json
@@ -27,10 +40,6 @@ from xgboost import XGBClassifier
 import numpy as np
 import pandas as pd
 import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
 
 from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import RobustScaler, LabelEncoder
@@ -41,68 +50,81 @@ from sklearn.svm import SVC
 from sklearn.neural_network import MLPClassifier
 from sklearn.calibration import CalibratedClassifierCV
 
-from imblearn.over_sampling import SMOTE
+from training.lpd_data import (
+    read_csv_any_encoding, normalize_column_names, map_columns, clean_frame, select_features,
+    to_numeric_frame, REQUIRED_COLUMNS
+)
+from training.report import save_confusion_matrix, write_pdf_report
+from training.imbalance import apply_imbalance, scale_pos_weight, benchmark_strategies
+from training.distill import distill_student
+from training.out_of_core import run_out_of_core
+from training.calibration import (
+    fit_calibration_mapping, MappedCalibratedModel, deployment_profile, CALIBRATION_MODES
+)
+from training.thresholds import (
+    save_oos_scores, tune_thresholds, row_hashes, unseen_rows,
+    matches_defaults as thresholds_match_defaults, print_summary as print_threshold_summary
+)
 
 # ---------------- Config ----------------
 # File - replace with your csv filename if different
-DATA_FILE = "Liver Patient Dataset (LPD)_train.csv"
+DATA_FILE = os.environ.get("DATA_FILE", "Liver Patient Dataset (LPD)_train.csv")
 RANDOM_STATE = 42
 TEST_SIZE = 0.20
 N_SPLITS = 5
 SMOTE_RANDOM = 42
+# smote | smote_batched | smote_approx | class_weight | sample_weight (training/imbalance.py)
+IMBALANCE_STRATEGY = os.environ.get("IMBALANCE_STRATEGY", "smote").lower()
+# Compare all strategies (time, memory, test metrics) before the main training run
+IMBALANCE_BENCHMARK = os.environ.get("IMBALANCE_BENCHMARK", "0") == "1"
 OUTPUT_DIR = "training_output"
+# "ensemble" = CalibratedClassifierCV(cv=3) (3 fitted copies of the model)
+# "sigmoid" / "isotonic" = single base model + one mapping fitted on out-of-fold predictions
+CALIBRATION_MODE = os.environ.get("CALIBRATION_MODE", "ensemble").lower()
+if CALIBRATION_MODE not in CALIBRATION_MODES:
+    raise ValueError(f"CALIBRATION_MODE must be one of {CALIBRATION_MODES}, got {CALIBRATION_MODE!r}")
+# Distill the final (teacher) model into a small student for low-latency serving
+DISTILL_STUDENT = os.environ.get("DISTILL_STUDENT", "0") == "1"
+DISTILL_ACC_TOLERANCE = float(os.environ.get("DISTILL_ACC_TOLERANCE", "0.005"))      # max accuracy drop vs teacher
+DISTILL_BRIER_TOLERANCE = float(os.environ.get("DISTILL_BRIER_TOLERANCE", "0.005"))  # max Brier increase vs teacher
+DISTILL_VAL_SIZE = 0.20  # fraction of the training rows held out to gate the student
+# Out-of-core mode for inputs larger than RAM (training/out_of_core.py)
+OUT_OF_CORE = os.environ.get("OUT_OF_CORE", "0") == "1"
+OOC_CHUNK_ROWS = int(os.environ.get("OOC_CHUNK_ROWS", "200000"))
+OOC_RESERVOIR_ROWS = int(os.environ.get("OOC_RESERVOIR_ROWS", "200000"))
+# sgd | xgb_reservoir | xgb_extmem (comma-separated); xgb_extmem memory grows with the row count
+OOC_MODELS = [m.strip() for m in os.environ.get("OOC_MODELS", "sgd,xgb_reservoir").lower().split(",") if m.strip()]
+OOC_DEDUP_FILTER_MB = float(os.environ.get("OOC_DEDUP_FILTER_MB", "16"))
+# Tune app.py risk bands + second-opinion threshold on a held-out tuning split (training/thresholds.py).
+# Opt-in: tuned bands change the clinical risk labels app.py returns (USE_TUNED_THRESHOLDS=1 there)
+TUNE_THRESHOLDS = os.environ.get("TUNE_THRESHOLDS", "0") == "1"
+TUNE_SIZE = 0.20  # fraction of the training rows held out for tuning
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+if OUT_OF_CORE:
+    run_out_of_core(
+        DATA_FILE, OUTPUT_DIR, chunk_rows=OOC_CHUNK_ROWS, test_size=TEST_SIZE,
+        random_state=RANDOM_STATE, reservoir_rows=OOC_RESERVOIR_ROWS,
+        tune_size=TUNE_SIZE if TUNE_THRESHOLDS else 0.0,
+        models=OOC_MODELS, dedup_filter_mb=OOC_DEDUP_FILTER_MB
+    )
+    raise SystemExit(0)
+
 # ---------------- Load dataset (robust encoding) ----------------
 print("📥 Loading dataset:", DATA_FILE)
 # Try common encodings and engine that handles weird chars
-encodings_to_try = ["utf-8", "latin1", "iso-8859-1", "cp1252"]
-df = None
-for enc in encodings_to_try:
-    try:
-        df = pd.read_csv(DATA_FILE, encoding=enc, engine="python")
-        print(f"    loaded with encoding: {enc}, shape: {df.shape}")
-        break
-    except Exception as e:
-        print(f"    failed with {enc}: {e}")
-if df is None:
-    raise RuntimeError("Failed to read dataset in tried encodings. Please check file or provide a different path/encoding.")
+df = read_csv_any_encoding(DATA_FILE)
 
 # Normalize column names (strip BOM/non-breaking spaces)
-df.columns = [c.strip().replace('\xa0', ' ').replace('\u00A0',' ').replace(' ', '_') for c in df.columns]
+df.columns = normalize_column_names(df.columns)
 
 print("Columns:", df.columns.tolist())
 
 # map column name variants
-col_map = {}
-for c in df.columns:
-    lc = c.lower()
-    if 'age' in lc and 'age' not in col_map:
-        col_map['Age'] = c
-    if 'gender' in lc and 'gender' not in col_map:
-        col_map['Gender'] = c
-    if 'tb' in lc or 'total bilirubin' in lc:
-        col_map['TB'] = c
-    if 'db' in lc or 'direct bilirubin' in lc:
-        col_map['DB'] = c
-    if 'alk' in lc or 'alkphos' in lc or 'alkaline' in lc:
-        col_map['Alkphos'] = c
-    if 'sgpt' in lc or 'alanine' in lc:
-        col_map['Sgpt'] = c
-    if 'sgot' in lc or 'aspartate' in lc:
-        col_map['Sgot'] = c
-    if 'tp' in lc or 'total protein' in lc or 'total_protiens' in lc:
-        col_map['TP'] = c
-    if 'alb' in lc and 'a/g' not in lc:
-        col_map['ALB'] = c
-    if 'a/g' in lc or 'a/g ratio' in lc or 'ag_ratio' in lc or 'a_g' in lc:
-        col_map['A_G'] = c
-    if 'result' in lc or 'selector' in lc:
-        col_map['Result'] = c
+col_map = map_columns(df.columns)
 
 # Check mandatory
-required = ['Age','Gender','TB','DB','Alkphos','Sgpt','Sgot','TP','ALB','A_G','Result']
-missing_required = [r for r in required if r not in col_map]
+missing_required = [r for r in REQUIRED_COLUMNS if r not in col_map]
 if missing_required:
     print("⚠ Missing expected columns (attempting to proceed):", missing_required)
 
@@ -112,41 +134,15 @@ df = df.rename(columns=rename_dict)
 print("After rename, columns:", df.columns.tolist())
 
 # ---------------- Basic cleaning ----------------
-# Strip whitespace in string columns
-for c in df.select_dtypes(include=['object']).columns:
-    df[c] = df[c].astype(str).str.strip()
-
-# Fix gender: map male/female to 1/0
-if 'Gender' in df.columns:
-    df['Gender'] = df['Gender'].replace({'M':'Male','F':'Female','m':'Male','f':'Female'})
-    df['Gender'] = df['Gender'].map(
-        lambda x: 1 if str(x).strip().lower().startswith('m')
-        else (0 if str(x).strip().lower().startswith('f') else np.nan)
-    )
-
-# Map Result: original dataset uses 1 (Liver Patient) and 2 (Non Liver)
-if 'Result' not in df.columns:
-    raise ValueError("Dataset must contain a Result column (target).")
-# ensure numeric
-df['Result'] = pd.to_numeric(df['Result'], errors='coerce')
-# map to 0/1: 1 -> 1 (disease), 2 -> 0 (no disease)
-df['Category'] = df['Result'].map(lambda x: 1 if int(x) == 1 else 0)
-
-# Drop rows with no Category
-df = df.dropna(subset=['Category'])
-df['Category'] = df['Category'].astype(int)
+# Strip strings, Gender male/female -> 1/0, Result 1 -> 1 (disease), 2 -> 0 (no disease)
+df = clean_frame(df)
 
 print("    after mapping Category, shape:", df.shape)
 print("📊 Class distribution (original):")
 print(df['Category'].value_counts())
 
 # ---------------- Select features ----------------
-features = []
-for key in ['Age','Gender','TB','DB','Alkphos','Sgpt','Sgot','TP','ALB','A_G']:
-    if key in df.columns:
-        features.append(key)
-    else:
-        print(f"⚠ Column {key} not found — will attempt to continue without it.")
+features = select_features(df)
 
 if len(features) < 5:
     print("⚠ Few features found; check dataset columns. Found features:", features)
@@ -155,8 +151,7 @@ X = df[features].copy()
 y = df['Category'].copy()
 
 # Convert numeric where possible
-for col in X.columns:
-    X[col] = pd.to_numeric(X[col], errors='coerce')
+X = to_numeric_frame(X)
 
 # Fill numeric missing values with median
 for c in X.columns:
@@ -184,11 +179,58 @@ X_train, X_test, y_train, y_test = train_test_split(
 )
 print("   Train:", X_train.shape, "Test:", X_test.shape)
 
-# ---------------- SMOTE on TRAIN only ----------------
-print("\n✨ Applying SMOTE on training set only...")
-smote = SMOTE(random_state=SMOTE_RANDOM)
-X_train_res, y_train_res = smote.fit_resample(X_train, y_train)
-print("   After SMOTE class counts:")
+# The test split picks the best model and reports its accuracy, so threshold tuning and the
+# student gate get their own rows; the LPD file has many exact duplicate rows, which would
+# otherwise leak from train into them
+X_tune = y_tune = X_val = y_val = None
+if TUNE_THRESHOLDS:
+    X_train, X_tune, y_train, y_tune = train_test_split(
+        X_train, y_train, test_size=TUNE_SIZE, stratify=y_train, random_state=RANDOM_STATE
+    )
+    n_tune_split = len(X_tune)
+if DISTILL_STUDENT:
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_train, y_train, test_size=DISTILL_VAL_SIZE, stratify=y_train, random_state=RANDOM_STATE
+    )
+    n_val_split = len(X_val)
+if TUNE_THRESHOLDS or DISTILL_STUDENT:
+    train_hashes = row_hashes(X_train)
+    if X_tune is not None:
+        unseen = unseen_rows(X_tune, train_hashes)
+        X_tune, y_tune = X_tune[unseen], y_tune[unseen]
+        print("   Tuning split:", n_tune_split, "rows,", len(X_tune), "left after dropping duplicates of train rows")
+    if X_val is not None:
+        unseen = unseen_rows(X_val, train_hashes)
+        X_val, y_val = X_val[unseen], y_val[unseen]
+        print("   Student validation split:", n_val_split, "rows,", len(X_val),
+              "left after dropping duplicates of train rows")
+    print("   Train:", X_train.shape)
+
+# ---------------- Optional: imbalance strategy benchmark ----------------
+def make_benchmark_model(strategy, y_res):
+    return XGBClassifier(
+        n_estimators=200, learning_rate=0.05, max_depth=4, subsample=0.8,
+        colsample_bytree=0.8, eval_metric='logloss', random_state=RANDOM_STATE,
+        scale_pos_weight=scale_pos_weight(strategy, y_res)
+    )
+
+if IMBALANCE_BENCHMARK:
+    print("\n⏱ Benchmarking imbalance strategies (XGBoost, same split)...")
+    bench = pd.DataFrame(benchmark_strategies(
+        X_train, y_train, X_test, y_test, make_benchmark_model, RobustScaler,
+        random_state=SMOTE_RANDOM
+    ))
+    print(bench.to_string(index=False))
+    bench_path = os.path.join(OUTPUT_DIR, "imbalance_benchmark.csv")
+    bench.to_csv(bench_path, index=False)
+    print("   Saved:", bench_path)
+
+# ---------------- Imbalance handling on TRAIN only ----------------
+print(f"\n✨ Applying imbalance strategy '{IMBALANCE_STRATEGY}' on training set only...")
+X_train_res, y_train_res, train_sample_weight = apply_imbalance(
+    IMBALANCE_STRATEGY, X_train, y_train, random_state=SMOTE_RANDOM
+)
+print(f"   After {IMBALANCE_STRATEGY} class counts:")
 print(pd.Series(y_train_res).value_counts())
 
 # ---------------- Scaling ----------------
@@ -212,12 +254,15 @@ print("✅ label mapping saved")
 
 # ---------------- Models --------------------------------
 print("\n🚀 Preparing candidate models...")
+# balanced per-row weights already encode the class balance in sample_weight mode
+model_class_weight = None if train_sample_weight is not None else 'balanced'
+fit_kwargs = {"sample_weight": train_sample_weight} if train_sample_weight is not None else {}
 models = {
     "RandomForest": RandomForestClassifier(
-        n_estimators=200, random_state=RANDOM_STATE, class_weight='balanced'
+        n_estimators=200, random_state=RANDOM_STATE, class_weight=model_class_weight
     ),
     "LogisticRegression": LogisticRegression(
-        max_iter=2000, class_weight='balanced', solver='liblinear'
+        max_iter=2000, class_weight=model_class_weight, solver='liblinear'
     ),
     "XGBoost": XGBClassifier(
         n_estimators=200,
@@ -226,7 +271,8 @@ models = {
         subsample=0.8,
         colsample_bytree=0.8,
         eval_metric='logloss',
-        random_state=RANDOM_STATE
+        random_state=RANDOM_STATE,
+        scale_pos_weight=scale_pos_weight(IMBALANCE_STRATEGY, y_train_res)
     )
 }
 skf = StratifiedKFold(
@@ -243,7 +289,7 @@ model_perfs = []
 for idx, (name, model) in enumerate(models.items(), start=1):
     print(f"\n[{idx}/{len(models)}] Training {name} ...")
     try:
-        model.fit(X_train_s, y_train_res)
+        model.fit(X_train_s, y_train_res, **fit_kwargs)
         y_pred = model.predict(X_test_s)
         acc_test = accuracy_score(y_test, y_pred)
         print(f"   -> Test accuracy: {acc_test:.4f}")
@@ -253,16 +299,9 @@ for idx, (name, model) in enumerate(models.items(), start=1):
         print(classification_report(y_test, y_pred, target_names=["No_Disease","Disease"]))
 
         cm = confusion_matrix(y_test, y_pred)
-        plt.figure(figsize=(5,4))
-        sns.heatmap(
-            cm, annot=True, fmt="d", cmap="Blues",
-            xticklabels=["No","Yes"], yticklabels=["No","Yes"]
+        cm_path = save_confusion_matrix(
+            cm, f"{name} - Test Confusion Matrix", os.path.join(OUTPUT_DIR, f"{name}_confusion.png")
         )
-        plt.title(f"{name} - Test Confusion Matrix")
-        plt.tight_layout()
-        cm_path = os.path.join(OUTPUT_DIR, f"{name}_confusion.png")
-        plt.savefig(cm_path)
-        plt.close()
         print("   Confusion matrix saved to:", cm_path)
 
         if acc_test > best_test_acc:
@@ -283,17 +322,47 @@ else:
     alt_model = None
 
 # Calibrate the best model probabilities if possible
-print("\n🔧 Calibrating probabilities (if applicable)...")
+print("\n🔧 Calibrating probabilities (if applicable), mode:", CALIBRATION_MODE)
+calibration_mapping = None
+calibration_report = None
 try:
-    if best_model is not None:
+    if best_model is None:
+        raise RuntimeError("No best model found.")
+    if CALIBRATION_MODE in ("sigmoid", "isotonic"):
+        # best_model is already fitted on the full augmented train set; only the mapping is new
+        calibration_mapping = fit_calibration_mapping(
+            best_model, X_train_s, y_train_res,
+            method=CALIBRATION_MODE, cv=3, random_state=RANDOM_STATE,
+            sample_weight=train_sample_weight
+        )
+        final_model = MappedCalibratedModel(best_model, calibration_mapping)
+        print("   Single-model calibration successful:", calibration_mapping["method"])
+
+        # Before/after: the cv=3 ensemble is fitted only for this comparison and then dropped
+        print("   Profiling ensemble (before) vs single model + mapping (after)...")
+        ensemble = CalibratedClassifierCV(best_model, cv=3, method='sigmoid')
+        ensemble.fit(X_train_s, y_train_res, **fit_kwargs)
+        calibration_report = {
+            "before_ensemble_cv3": deployment_profile(ensemble, X_test_s, y_test),
+            f"after_single_{CALIBRATION_MODE}": deployment_profile(
+                best_model, X_test_s, y_test, mapping=calibration_mapping
+            ),
+        }
+        del ensemble
+        for label, r in calibration_report.items():
+            print(f"   {label}: size={r['size_bytes']/1e6:.2f}MB load={r['load_seconds']:.3f}s "
+                  f"latency={r['latency_ms_per_request']:.2f}ms brier={r['brier']:.4f} "
+                  f"logloss={r['log_loss']:.4f} ece={r['ece']:.4f}")
+        with open(os.path.join(OUTPUT_DIR, "calibration_report.json"), "w") as f:
+            json.dump(calibration_report, f, indent=2)
+    else:
         calib = CalibratedClassifierCV(best_model, cv=3, method='sigmoid')
-        calib.fit(X_train_s, y_train_res)
+        calib.fit(X_train_s, y_train_res, **fit_kwargs)
         final_model = calib
         print("   Calibration successful.")
-    else:
-        raise RuntimeError("No best model found.")
 except Exception as e:
     print("   Calibration failed, using raw best model. Error:", e)
+    calibration_mapping = None
     final_model = best_model
 
 # Final evaluation
@@ -308,18 +377,74 @@ print("\n📍 Final Test Accuracy:", test_acc_final)
 print("📍 Final classification report:")
 print(classification_report(y_test, y_pred_final, target_names=["No_Disease","Disease"]))
 
+# ---------------- Threshold / risk-band tuning ----------------
+# out-of-sample disease probabilities of the model app.py serves (calibration included)
+thresholds_path = os.path.join(OUTPUT_DIR, "thresholds.json")
+oos_path = os.path.join(OUTPUT_DIR, "oos_scores.npz")
+thresholds_result = None
+if TUNE_THRESHOLDS and hasattr(final_model, "predict_proba") and len(X_tune):
+    disease_probs_tune = final_model.predict_proba(scaler.transform(X_tune))[:, list(final_model.classes_).index(1)]
+    save_oos_scores(oos_path, y_tune, disease_probs_tune)
+    print("\n🎚  Tuning risk bands and second-opinion threshold on the tuning split...")
+    try:
+        thresholds_result = tune_thresholds(
+            y_tune, disease_probs_tune, OUTPUT_DIR,
+            source=f"tuning split ({len(X_tune)} of {n_tune_split} rows, duplicates of train dropped)"
+        )
+        print_threshold_summary(thresholds_result)
+        print("   Saved:", thresholds_path)
+    except Exception as e:
+        print("   Threshold tuning failed:", e)
+# scores and cut-points from a previous model; app.py falls back to its defaults
+if thresholds_result is None:
+    for stale in (thresholds_path, os.path.join(OUTPUT_DIR, "thresholds_curves.png")):
+        if os.path.exists(stale):
+            os.remove(stale)
+if not TUNE_THRESHOLDS and os.path.exists(oos_path):
+    os.remove(oos_path)
+
+# ---------------- Optional: distill a low-latency student ----------------
+student_report = None
+student_path = os.path.join(OUTPUT_DIR, "student_model.pkl")
+if DISTILL_STUDENT and len(X_val) == 0:
+    print("\n⚠ Student validation split is empty after dropping duplicates; skipping distillation.")
+elif DISTILL_STUDENT:
+    print("\n🎓 Distilling final model into a compact student (gated on the validation split)...")
+    try:
+        # Teacher probabilities over the SMOTE-augmented train set (real + synthetic rows)
+        student_model, student_report = distill_student(
+            final_model, X_train_s, scaler.transform(X_val), y_val,
+            acc_tolerance=DISTILL_ACC_TOLERANCE,
+            brier_tolerance=DISTILL_BRIER_TOLERANCE,
+            random_state=RANDOM_STATE
+        )
+        t = student_report["teacher"]
+        print(f"   Teacher: acc={t['accuracy']:.4f} brier={t['brier']:.4f} "
+              f"size={t['size_bytes']/1e6:.2f}MB latency={t['latency_ms_per_row']:.2f}ms/row")
+        for name, r in student_report["candidates"].items():
+            print(f"   {name}: acc={r['accuracy']:.4f} brier={r['brier']:.4f} "
+                  f"agreement={r['agreement_with_teacher']:.4f} size={r['size_bytes']/1e6:.3f}MB "
+                  f"latency={r['latency_ms_per_row']:.2f}ms/row -> {'PASS' if r['passed_gate'] else 'FAIL'}")
+        if student_model is not None:
+            joblib.dump(student_model, student_path)
+            print("   ✅ Accepted student:", student_report["accepted"], "saved to", student_path)
+        else:
+            print("   ⚠ No student stayed within tolerance; serving the teacher only.")
+        with open(os.path.join(OUTPUT_DIR, "distill_report.json"), "w") as f:
+            json.dump(student_report, f, indent=2)
+    except Exception as e:
+        print("   Distillation failed:", e)
+        student_report = None
+if (student_report is None or student_report["accepted"] is None) and os.path.exists(student_path):
+    # never leave a stale student behind that no longer matches this run's scaler/teacher
+    os.remove(student_path)
+
 # Save final confusion matrix
 cm_final = confusion_matrix(y_test, y_pred_final)
-plt.figure(figsize=(6,5))
-sns.heatmap(
-    cm_final, annot=True, fmt="d", cmap="Purples",
-    xticklabels=["No","Yes"], yticklabels=["No","Yes"]
+final_cm_path = save_confusion_matrix(
+    cm_final, f"Final Model ({best_name}) Confusion Matrix",
+    os.path.join(OUTPUT_DIR, f"final_confusion_{best_name}.png"), cmap="Purples", figsize=(6,5)
 )
-plt.title(f"Final Model ({best_name}) Confusion Matrix")
-plt.tight_layout()
-final_cm_path = os.path.join(OUTPUT_DIR, f"final_confusion_{best_name}.png")
-plt.savefig(final_cm_path)
-plt.close()
 print("Saved final confusion matrix to:", final_cm_path)
 
 # ---------- NEW: write metrics.json for PHP dashboard ----------
@@ -330,6 +455,17 @@ metrics = {
     "n_train": int(len(X_train_s)),
     "n_test": int(len(X_test_s)),
 }
+if X_tune is not None:
+    metrics["n_tune"] = int(len(X_tune))
+if X_val is not None:
+    metrics["n_student_val"] = int(len(X_val))
+metrics["imbalance"] = IMBALANCE_STRATEGY
+metrics["calibration"] = calibration_mapping["method"] if calibration_mapping else CALIBRATION_MODE
+if student_report is not None:
+    metrics["student_model"] = student_report["accepted"]
+metrics["thresholds"] = (
+    "tuned" if thresholds_result is not None and not thresholds_match_defaults(thresholds_result) else "default"
+)
 metrics_path = os.path.join(OUTPUT_DIR, "metrics.json")
 with open(metrics_path, "w") as f:
     json.dump(metrics, f, indent=2)
@@ -338,7 +474,18 @@ print("Saved metrics.json to:", metrics_path)
 
 # ---------------- Save artifacts ----------------
 print("\n💾 Saving artifacts for deployment...")
-joblib.dump(final_model, os.path.join(OUTPUT_DIR, "best_hcv_model.pkl"))
+calibration_path = os.path.join(OUTPUT_DIR, "calibration.json")
+if calibration_mapping is not None:
+    # one base model + a tiny mapping that app.py applies after predict_proba
+    joblib.dump(best_model, os.path.join(OUTPUT_DIR, "best_hcv_model.pkl"))
+    with open(calibration_path, "w") as f:
+        json.dump(calibration_mapping, f, indent=2)
+    print("Saved calibration mapping to:", calibration_path)
+else:
+    joblib.dump(final_model, os.path.join(OUTPUT_DIR, "best_hcv_model.pkl"))
+    # a stale mapping must not be applied on top of an already calibrated model
+    if os.path.exists(calibration_path):
+        os.remove(calibration_path)
 print("Saved best model to:", os.path.join(OUTPUT_DIR, "best_hcv_model.pkl"))
 
 if alt_model is not None:
@@ -376,34 +523,17 @@ print("Saved:", test_sample_path, "| rows:", len(test_sample))
 
 # ---------------- PDF report ----------------
 report_name = os.path.join(OUTPUT_DIR, f"Training_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
-c = canvas.Canvas(report_name, pagesize=letter)
-w, h = letter
-c.setFont("Helvetica-Bold", 16)
-c.drawString(50, 750, "Liver Disease Model — Training Report")
-
-c.setFont("Helvetica", 11)
-c.drawString(50, 730, f"Best Model: {best_name}")
-c.drawString(50, 715, f"Final Test Accuracy: {test_acc_final:.4f}")
-c.drawString(50, 700, f"Train (approx) accuracy on augmented train: {final_model.score(X_train_s, y_train_res):.4f}")
-c.drawString(50, 685, f"CV folds: {N_SPLITS}")
-c.drawString(50, 670, f"Dataset shape (after cleaning): {df.shape}")
-
-if os.path.exists(final_cm_path):
-    try:
-        c.drawImage(final_cm_path, 50, 350, width=480, preserveAspectRatio=True)
-    except Exception:
-        pass
-
+report_lines = [
+    f"Best Model: {best_name}",
+    f"Final Test Accuracy: {test_acc_final:.4f}",
+    f"Train (approx) accuracy on augmented train: {final_model.score(X_train_s, y_train_res):.4f}",
+    f"CV folds: {N_SPLITS}",
+    f"Dataset shape (after cleaning): {df.shape}",
+    f"Calibration: {metrics['calibration']} | Imbalance: {IMBALANCE_STRATEGY}",
+]
+if student_report is not None:
+    report_lines.append(f"Distilled student: {student_report['accepted'] or 'none accepted'}")
 report_str = classification_report(y_test, y_pred_final, target_names=["No_Disease","Disease"])
-c.setFont("Helvetica", 9)
-ypos = 320
-for line in report_str.splitlines():
-    c.drawString(40, ypos, line[:120])
-    ypos -= 12
-    if ypos < 60:
-        c.showPage()
-        ypos = 740
-
-c.save()
+write_pdf_report(report_name, report_lines, final_cm_path, report_str)
 print("Saved PDF report:", report_name)
 print("\n🎉 Training finished. Artifacts in:", OUTPUT_DIR)
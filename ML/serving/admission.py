@@ -0,0 +1,120 @@
+"""
+serving/admission.py
+
+Admission control and graceful degradation for the prediction endpoint.
+- At most `max_concurrent` predictions run at once; up to `max_queue` more wait
+  (bounded by `queue_timeout` seconds); anything beyond that is rejected at once
+  so the caller can answer 503 + Retry-After instead of letting latency grow unbounded
+- Each admitted request gets a degradation level picked from the queue depth and the
+  recent latency (EWMA) at admission time:
+    0 "full"                 SHAP explanations + alt-model second opinion
+    1 "fast_factors"         scaler-based top factors instead of SHAP
+    2 "fast_factors_no_alt"  as 1, and the alt-model second opinion is skipped
+- The latency EWMA decays towards 0 with a half-life of `ewma_half_life` seconds since the
+  last completed request, so one slow request (e.g. lazy SHAP init) does not pin the level
+- Latency alone only reaches level 1; dropping the alt-model safety check (level 2) also
+  needs requests actually waiting (`fast_factors_queue` or more)
+"""
+import math
+import threading
+import time
+
+DEGRADED_MODES = ["full", "fast_factors", "fast_factors_no_alt"]
+
+
+class Ticket:
+    def __init__(self, level):
+        self.level = level
+        self.mode = DEGRADED_MODES[level]
+        self.started = time.perf_counter()
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=4, max_queue=16, queue_timeout=5.0,
+                 fast_factors_queue=2, no_alt_queue=8,
+                 fast_factors_latency=0.5, no_alt_latency=1.5, ewma_alpha=0.2,
+                 ewma_half_life=10.0):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self.fast_factors_queue = fast_factors_queue
+        self.no_alt_queue = no_alt_queue
+        self.fast_factors_latency = fast_factors_latency
+        self.no_alt_latency = no_alt_latency
+        self.ewma_alpha = ewma_alpha
+        self.ewma_half_life = ewma_half_life
+
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.ewma_latency = 0.0
+        self._ewma_updated = time.monotonic()
+        self.rejected = 0
+
+    def recent_latency(self):
+        """EWMA latency decayed by the time since it was last updated."""
+        if not self.ewma_half_life:
+            return self.ewma_latency
+        idle = time.monotonic() - self._ewma_updated
+        return self.ewma_latency * 0.5 ** (idle / self.ewma_half_life)
+
+    def degradation_level(self):
+        """Ladder step for the current load; call with the lock held."""
+        latency = self.recent_latency()
+        if self.waiting >= self.no_alt_queue or (
+                latency >= self.no_alt_latency and self.waiting >= self.fast_factors_queue):
+            return 2
+        if self.waiting >= self.fast_factors_queue or latency >= self.fast_factors_latency:
+            return 1
+        return 0
+
+    def retry_after(self):
+        """Seconds a rejected client should wait: the time to drain the current queue."""
+        per_slot = max(self.recent_latency(), 0.05)
+        return max(1, int(math.ceil(per_slot * (self.waiting + 1) / self.max_concurrent)))
+
+    def acquire(self):
+        """Return a Ticket, or None if the request should be shed."""
+        with self._cond:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    return None
+                self.waiting += 1
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self.active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected += 1
+                            return None
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            # level is chosen while this request still sees the queue behind it
+            level = self.degradation_level()
+            self.active += 1
+            return Ticket(level)
+
+    def release(self, ticket):
+        elapsed = time.perf_counter() - ticket.started
+        with self._cond:
+            self.active -= 1
+            if self.ewma_latency == 0.0:
+                self.ewma_latency = elapsed
+            else:
+                self.ewma_latency = (1 - self.ewma_alpha) * self.recent_latency() + self.ewma_alpha * elapsed
+            self._ewma_updated = time.monotonic()
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "ewma_latency_ms": round(self.recent_latency() * 1000.0, 2),
+                "rejected": self.rejected,
+                "current_mode": DEGRADED_MODES[self.degradation_level()],
+            }
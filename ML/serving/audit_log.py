@@ -0,0 +1,329 @@
+"""
+serving/audit_log.py
+
+Asynchronous, batched prediction audit log for app.py.
+- record() only appends to an in-memory ring buffer (collections.deque with maxlen):
+  no locks held across I/O, no disk access on the request path. When the buffer is
+  full the oldest unflushed record is overwritten and counted in `dropped`
+- A background thread (started lazily per process, so it survives prefork; it creates
+  the directory itself, the request path never touches the filesystem) drains the
+  buffer in batches and appends each batch as one compressed block to the current
+  segment file; segments rotate at `segment_bytes` and only the newest `max_segments`
+  in the whole directory are kept (None = keep all). Retention spans all processes, so
+  segments left by dead prefork workers are pruned too; the segment a live process is
+  still writing is never deleted
+- fsync policy: "always" (every block), "interval" (at most every `fsync_interval`
+  seconds) or "never" (leave it to the OS)
+
+Segment file layout (append-only, one file per process and sequence number):
+    block = header + payload
+    header = struct "<4sIIIdd": magic b"LCA1", record count, payload length,
+             crc32(payload), min ts, max ts
+    payload = zlib(newline-separated compact JSON records)
+The readers skip whole blocks by time range using the header alone.
+
+Reader CLI:
+    python -m serving.audit_log audit_log/ [--since EPOCH] [--until EPOCH] [--tail N] [--verify]
+(--verify recomputes every record's prediction hash, binary or legacy JSON layout)
+"""
+import atexit
+import collections
+import glob
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+BLOCK_MAGIC = b"LCA1"
+BLOCK_HEADER = struct.Struct("<4sIIIdd")
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class AuditLog:
+    def __init__(self, directory, ring_size=100_000, batch_size=2000, flush_interval=0.5,
+                 segment_bytes=64 * 1024 * 1024, max_segments=None,
+                 fsync="interval", fsync_interval=5.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.directory = directory
+        self.ring_size = ring_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+
+        self._buffer = collections.deque(maxlen=ring_size)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._seq = 0
+        self._last_fsync = 0.0
+        self.dropped = 0
+        self.written = 0
+
+    # ---------------- Request path ----------------
+    def record(self, rec):
+        """Queue one record (a JSON-serialisable dict). Never blocks on disk I/O."""
+        if self._pid != os.getpid():
+            self._start_writer()
+        if len(self._buffer) == self.ring_size:
+            self.dropped += 1
+        self._buffer.append(rec)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    # ---------------- Writer thread ----------------
+    def _start_writer(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # after a fork the parent's thread and file handle do not exist in this process
+            self._pid = os.getpid()
+            self._file = None
+            self._seq = 0
+            self._stop.clear()
+            # no filesystem calls here: this runs on the first request of every process
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            print("Audit log directory unavailable:", e)
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+        self._drain()
+        self._close_segment()
+
+    def _drain(self):
+        while self._buffer:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._buffer.popleft())
+            except IndexError:
+                pass
+            if batch:
+                try:
+                    self._write_block(batch)
+                except Exception as e:
+                    print("Audit log write failed:", e)
+                    self.dropped += len(batch)
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"audit-{self._pid}-{int(time.time())}-{seq:06d}.seg")
+
+    def _open_segment(self):
+        self._seq += 1
+        self._file = open(self._segment_path(self._seq), "ab")
+        if self.max_segments:
+            self._apply_retention()
+
+    def _apply_retention(self):
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, "audit-*-*.seg")):
+            try:
+                segments.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        segments.sort()
+        # newest segment of every live writer is still open: keep it whatever its age
+        newest = {}
+        for _, path in segments:
+            newest[_segment_pid(path)] = path
+        protected = {path for pid, path in newest.items() if pid is not None and _pid_alive(pid)}
+        excess = len(segments) - self.max_segments
+        for _, path in segments:
+            if excess <= 0:
+                break
+            if path in protected:
+                continue
+            try:
+                os.remove(path)
+                excess -= 1
+            except OSError:
+                pass
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _write_block(self, batch):
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            self._close_segment()
+            self._open_segment()
+        lines = "\n".join(json.dumps(r, separators=(",", ":"), default=_json_default) for r in batch)
+        payload = zlib.compress(lines.encode("utf-8"), 6)
+        stamps = [r.get("ts", 0.0) for r in batch]
+        header = BLOCK_HEADER.pack(BLOCK_MAGIC, len(batch), len(payload),
+                                   zlib.crc32(payload), min(stamps), max(stamps))
+        self._file.write(header + payload)
+        self._file.flush()
+        self.written += len(batch)
+
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    # ---------------- Lifecycle ----------------
+    def close(self, timeout=5.0):
+        """Flush everything still buffered and stop the writer (safe to call twice)."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+
+    def register_atexit(self):
+        atexit.register(self.close)
+        return self
+
+    def stats(self):
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "fsync": self.fsync,
+        }
+
+
+def _segment_pid(path):
+    try:
+        return int(os.path.basename(path).split("-")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _json_default(o):
+    # NumPy scalars / arrays that slip into a record
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    return str(o)
+
+
+# ---------------- Reader ----------------
+def iter_blocks(path, since=None, until=None):
+    """Yield (count, decoded payload text) for every valid block of one segment in range."""
+    with open(path, "rb") as f:
+        data = f.read()
+    pos, end = 0, len(data)
+    while pos + BLOCK_HEADER.size <= end:
+        magic, count, length, crc, ts_min, ts_max = BLOCK_HEADER.unpack_from(data, pos)
+        body_start = pos + BLOCK_HEADER.size
+        if magic != BLOCK_MAGIC or body_start + length > end:
+            break  # torn tail from a crash: stop at the last complete block
+        pos = body_start + length
+        if (since is not None and ts_max < since) or (until is not None and ts_min > until):
+            continue
+        payload = data[body_start:pos]
+        if zlib.crc32(payload) != crc:
+            continue
+        yield count, zlib.decompress(payload).decode("utf-8")
+
+
+def segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, "*.seg")), key=os.path.getmtime)
+
+
+def iter_records(directory, since=None, until=None):
+    """Yield every record (dict) in the directory, oldest segment first."""
+    for path in segment_paths(directory):
+        for _, text in iter_blocks(path, since, until):
+            for line in text.split("\n"):
+                rec = json.loads(line)
+                ts = rec.get("ts", 0.0)
+                if (since is None or ts >= since) and (until is None or ts <= until):
+                    yield rec
+
+
+def count_records(directory, since=None, until=None):
+    """Record count from block headers only (no decompression) when no range is given."""
+    if since is None and until is None:
+        total = 0
+        for path in segment_paths(directory):
+            with open(path, "rb") as f:
+                data = f.read()
+            pos = 0
+            while pos + BLOCK_HEADER.size <= len(data):
+                magic, count, length, _, _, _ = BLOCK_HEADER.unpack_from(data, pos)
+                if magic != BLOCK_MAGIC or pos + BLOCK_HEADER.size + length > len(data):
+                    break
+                total += count
+                pos += BLOCK_HEADER.size + length
+        return total
+    return sum(1 for _ in iter_records(directory, since, until))
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Scan LiverCare prediction audit segments.")
+    ap.add_argument("directory")
+    ap.add_argument("--since", type=float, default=None, help="epoch seconds")
+    ap.add_argument("--until", type=float, default=None, help="epoch seconds")
+    ap.add_argument("--tail", type=int, default=0, help="print the last N records")
+    ap.add_argument("--verify", action="store_true", help="recompute and check prediction hashes")
+    args = ap.parse_args(argv)
+    if args.verify:
+        from serving.response import verify_prediction_hash
+
+    start = time.perf_counter()
+    n = 0
+    latencies = []
+    by_label = collections.Counter()
+    tail = collections.deque(maxlen=args.tail) if args.tail else None
+    bad_hashes = 0
+    for rec in iter_records(args.directory, args.since, args.until):
+        n += 1
+        if args.verify and not verify_prediction_hash(rec.get("hash"), rec.get("patient_id", ""),
+                                                      rec.get("features", {}), rec.get("prediction"),
+                                                      rec.get("disease_probability")):
+            bad_hashes += 1
+        by_label[rec.get("prediction")] += 1
+        if "latency_ms" in rec:
+            latencies.append(rec["latency_ms"])
+        if tail is not None:
+            tail.append(rec)
+    elapsed = time.perf_counter() - start
+
+    print(f"records: {n} | scanned in {elapsed:.2f}s ({n / max(elapsed, 1e-9):,.0f} rec/s)")
+    print("predictions:", dict(by_label))
+    if args.verify:
+        print(f"hash mismatches: {bad_hashes}")
+    if latencies:
+        latencies.sort()
+        pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]  # noqa: E731
+        print(f"latency ms: p50={pick(0.50):.1f} p95={pick(0.95):.1f} p99={pick(0.99):.1f} max={latencies[-1]:.1f}")
+    for rec in tail or []:
+        print(json.dumps(rec))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+serving/launcher.py
+
+Preforking production launcher for the LiverCare API (Linux/Unix only).
+- The master process has already imported app.py (models, scaler, alt model loaded);
+  it runs `warmup` (e.g. SHAP explainer init), binds the listening socket, then calls
+  gc.collect() + gc.freeze() so the garbage collector never touches (and therefore never
+  un-shares) the preloaded objects in the children
+- N workers are forked and share that memory copy-on-write; each serves the inherited
+  socket with a threaded werkzeug server
+- The master supervises: dead workers are respawned (with a short backoff against
+  crash loops) and SIGTERM/SIGINT shut everything down; workers stop serving on
+  SIGTERM and run `on_worker_exit` (e.g. flushing the audit log) before exiting
+- Every `report_interval` seconds the master prints per-worker unique (USS) vs shared
+  memory from /proc/<pid>/smaps_rollup and how many workers fit in MemAvailable,
+  compared with one full process per model copy
+"""
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def resolve_workers(value):
+    """"auto" / empty -> CPU count, otherwise a positive int."""
+    if value in (None, "", "auto"):
+        return default_workers()
+    return max(1, int(value))
+
+
+# ---------------- Memory accounting ----------------
+def read_smaps_rollup(pid):
+    """kB figures for a process, or None where /proc/<pid>/smaps_rollup is unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    fields = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+            fields[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "unique_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared_kb": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def mem_available_kb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def memory_report(master_pid, worker_pids):
+    master = read_smaps_rollup(master_pid)
+    workers = {pid: read_smaps_rollup(pid) for pid in worker_pids}
+    workers = {pid: m for pid, m in workers.items() if m is not None}
+    report = {"master": master, "workers": workers}
+    available = mem_available_kb()
+    if master and workers and available:
+        mean_unique = sum(m["unique_kb"] for m in workers.values()) / len(workers)
+        mean_rss = sum(m["rss_kb"] for m in workers.values()) / len(workers)
+        # prefork: each extra worker costs only its unique pages
+        report["workers_that_fit_prefork"] = int(available / max(mean_unique, 1))
+        # today: every process holds a full private copy of the models
+        report["workers_that_fit_separate"] = int(available / max(mean_rss, 1))
+    return report
+
+
+def print_memory_report(report):
+    print("📊 Prefork memory (kB):")
+    if report["master"]:
+        m = report["master"]
+        print(f"   master  rss={m['rss_kb']} unique={m['unique_kb']} shared={m['shared_kb']}")
+    for pid, m in sorted(report["workers"].items()):
+        print(f"   worker {pid} rss={m['rss_kb']} pss={m['pss_kb']} "
+              f"unique={m['unique_kb']} shared={m['shared_kb']}")
+    if "workers_that_fit_prefork" in report:
+        print(f"   workers that fit in MemAvailable: prefork≈{report['workers_that_fit_prefork']} "
+              f"vs one-process-per-copy≈{report['workers_that_fit_separate']}")
+    sys.stdout.flush()
+
+
+# ---------------- Worker / master ----------------
+def _exit_worker(signum, frame):
+    raise SystemExit(0)
+
+
+def _worker_main(wsgi_app, host, port, sock, on_exit=None):
+    signal.signal(signal.SIGTERM, _exit_worker)
+    signal.signal(signal.SIGINT, _exit_worker)
+    code = 0
+    try:
+        server = make_server(host, port, wsgi_app, threaded=True, fd=sock.fileno())
+        server.serve_forever()
+    except SystemExit:
+        pass
+    except BaseException as e:
+        print(f"Worker {os.getpid()} exiting:", e)
+        code = 1
+    if on_exit is not None:
+        try:
+            on_exit()
+        except Exception as e:
+            print(f"Worker {os.getpid()} exit hook failed:", e)
+    sys.stdout.flush()
+    os._exit(code)
+
+
+def serve_prefork(wsgi_app, host="0.0.0.0", port=5000, workers=None, warmup=None,
+                  report_interval=60.0, respawn_backoff=1.0, on_worker_exit=None):
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Prefork launcher needs os.fork (Linux/Unix).")
+    workers = resolve_workers(workers)
+
+    if warmup is not None:
+        warmup()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    # Move everything loaded so far into the permanent generation before forking
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+    children = {}
+    stopping = {"flag": False}
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _worker_main(wsgi_app, host, port, sock, on_worker_exit)
+        children[pid] = time.monotonic()
+        return pid
+
+    def stop(signum, frame):
+        stopping["flag"] = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"🚀 Prefork master {os.getpid()} on {host}:{port} with {workers} workers")
+    sys.stdout.flush()
+    for _ in range(workers):
+        spawn()
+
+    next_report = time.monotonic() + min(5.0, report_interval)
+    try:
+        while not stopping["flag"]:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid, status = 0, 0
+            if pid and pid in children:
+                started = children.pop(pid)
+                print(f"⚠ Worker {pid} died (status {status}); respawning")
+                # a worker that dies right after start is probably crash-looping
+                if time.monotonic() - started < respawn_backoff:
+                    time.sleep(respawn_backoff)
+                if not stopping["flag"]:
+                    spawn()
+                continue
+            if report_interval and time.monotonic() >= next_report:
+                print_memory_report(memory_report(os.getpid(), list(children)))
+                next_report = time.monotonic() + report_interval
+            time.sleep(0.2)
+    finally:
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sock.close()
+        print("Prefork master stopped.")
@@ -0,0 +1,181 @@
+"""
+serving/response.py
+
+Response assembly for /api/predict.
+- Constant fragments (food recommendations) are built once at import, not per request
+- Factor explanations and the summary sentence come from precomputed templates
+- The prediction hash is SHA-256 over a fixed binary layout (HASH_MODE="binary"):
+      b"LCH2" | u32 len + patient_id (utf-8) | u16 n + n x float64 features
+              | u32 len + predicted label (utf-8) | float64 disease probability
+  b"LCH1" (u16 string lengths, so ids were capped at 65535 bytes) is still verified.
+  HASH_MODE="json" keeps the previous sha256(json.dumps(payload, sort_keys=True)) so
+  existing hashes stay reproducible; verify_prediction_hash() accepts every layout
+- FastJSONProvider plugs into Flask (app.json) and serialises with orjson when installed
+  (NumPy scalars/arrays handled natively), otherwise with json plus a NumPy fallback
+"""
+import hashlib
+import json
+import struct
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+HASH_MODES = ("binary", "json")
+
+# ---------------- Constant fragments ----------------
+FOOD_RECOMMENDATIONS = {
+    "liver_friendly": [
+        "Leafy greens (spinach, kale)",
+        "High-fiber whole grains (oats, brown rice)",
+        "Lean proteins (chicken, fish)",
+        "Fresh fruits (berries, apples)",
+        "Healthy fats (olive oil, avocados)"
+    ],
+    "avoid": [
+        "Alcohol",
+        "High-fat fried foods",
+        "Sugary beverages and sweets",
+        "Processed meats",
+        "Excess salt"
+    ],
+    "notes": "General guidelines. Consult a medical professional for personalized advice."
+}
+NO_DISEASE_FOOD = {"note": "No disease predicted — general healthy diet recommended."}
+
+
+def food_recommendations(disease_flag):
+    return FOOD_RECOMMENDATIONS if disease_flag else NO_DISEASE_FOOD
+
+
+# ---------------- Explanation templates ----------------
+_TRENDS = {
+    (True, True): "increased the likelihood of liver disease",
+    (True, False): "reduced the likelihood of liver disease (protective effect)",
+    (False, True): "helped the model stay confident there is no liver disease (protective effect)",
+    (False, False): "pushed the model slightly towards liver disease but not enough to change the final decision",
+}
+# "{level} {trend}" for every (disease_flag, positive impact, level)
+_FACTOR_PHRASES = {
+    (flag, positive, level): f"{level} {trend}"
+    for (flag, positive), trend in _TRENDS.items()
+    for level in ("strongly", "moderately", "slightly")
+}
+
+SUMMARY_DISEASE = (
+    "The model predicted Liver Disease with a {risk} risk and {conf:.2f}% confidence. "
+    "The following factors contributed towards liver disease in this case: "
+)
+SUMMARY_NO_DISEASE = (
+    "The model predicted No Liver Disease with a {risk} risk level and {conf:.2f}% confidence. "
+    "The following factors helped the model stay confident that there is no liver disease: "
+)
+
+
+def explain_factor(feature, impact, disease_flag):
+    try:
+        impact = float(impact)
+        strength = abs(impact)
+        level = "strongly" if strength > 0.5 else "moderately" if strength > 0.2 else "slightly"
+        phrase = _FACTOR_PHRASES[(bool(disease_flag), impact > 0, level)]
+        return f"{feature} {phrase} (impact: {impact:.3f})"
+    except Exception:
+        return f"{feature} impact {impact}"
+
+
+def explanation_text(disease_flag, risk_label, primary_conf, top_factors):
+    template = SUMMARY_DISEASE if disease_flag else SUMMARY_NO_DISEASE
+    return template.format(risk=risk_label, conf=primary_conf * 100) + " ".join(
+        t.get("explanation", "") for t in top_factors
+    )
+
+
+# ---------------- Prediction hash ----------------
+# magic -> struct format of the string length prefix
+BINARY_LAYOUTS = {b"LCH2": "<I", b"LCH1": "<H"}
+
+
+def _pack_str(s, length_fmt="<I"):
+    b = str(s).encode("utf-8")
+    return struct.pack(length_fmt, len(b)) + b
+
+
+def binary_hash(patient_id, feature_values, predicted_label, disease_prob, magic=b"LCH2"):
+    length_fmt = BINARY_LAYOUTS[magic]
+    values = [float(v) for v in feature_values]
+    buf = b"".join((
+        magic,
+        _pack_str(patient_id, length_fmt),
+        struct.pack(f"<H{len(values)}d", len(values), *values),
+        _pack_str(predicted_label, length_fmt),
+        struct.pack("<d", float(disease_prob)),
+    ))
+    return hashlib.sha256(buf).hexdigest()
+
+
+def legacy_json_hash(patient_id, features, predicted_label, disease_prob):
+    """The pre-binary layout; `features` is the {name: float} dict in feature order."""
+    payload_for_hash = {
+        "patient_id": patient_id,
+        "features": features,
+        "predicted_label": predicted_label,
+        "disease_probability": disease_prob
+    }
+    return hashlib.sha256(json.dumps(payload_for_hash, sort_keys=True).encode()).hexdigest()
+
+
+def prediction_hash(mode, patient_id, feature_names, feature_values, predicted_label, disease_prob):
+    if mode == "json":
+        features = dict(zip(feature_names, [float(x) for x in feature_values]))
+        return legacy_json_hash(patient_id, features, predicted_label, disease_prob)
+    return binary_hash(patient_id, feature_values, predicted_label, disease_prob)
+
+
+def verify_prediction_hash(expected, patient_id, features, predicted_label, disease_prob):
+    """
+    True if `expected` matches any layout. `features` is the {name: value} dict in
+    model feature order, as stored in audit records.
+    """
+    features = {k: float(v) for k, v in features.items()}
+    for magic in BINARY_LAYOUTS:
+        try:
+            if binary_hash(patient_id, list(features.values()), predicted_label, disease_prob, magic) == expected:
+                return True
+        except struct.error:
+            pass  # too long for the old u16 length prefix, so it cannot be an LCH1 hash
+    return legacy_json_hash(patient_id, features, predicted_label, disease_prob) == expected
+
+
+# ---------------- Fast JSON ----------------
+def _numpy_default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    return DefaultJSONProvider.default(o)   # dates, decimals, dataclasses, ...
+
+
+def dumps_bytes(obj):
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_numpy_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_numpy_default, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by dumps_bytes(); keys keep insertion order."""
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
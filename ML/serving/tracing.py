@@ -0,0 +1,179 @@
+"""
+serving/tracing.py
+
+Per-request span traces for /api/predict.
+- Trace is a context manager; while it is active, span("name") blocks anywhere in the
+  request thread (found through a contextvar) become nested timed spans. Without an active
+  trace span() is a near no-op, so the instrumentation stays in place in production
+- annotate(**attrs) attaches facts (e.g. which factor path ran) to the current span
+- Trace(profile=True) additionally runs cProfile for the request and attaches the top
+  functions by cumulative time. Only one request is profiled at a time (the interpreter
+  allows a single active profiler); concurrent requests get "profile": "busy"
+- SlowestTraces keeps the N slowest finished traces in a bounded min-heap for inspection
+"""
+import contextlib
+import contextvars
+import cProfile
+import heapq
+import itertools
+import os
+import pstats
+import threading
+import time
+
+_current = contextvars.ContextVar("livercare_trace", default=None)
+_profile_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    def to_dict(self, t0):
+        end = self.end if self.end is not None else time.perf_counter()
+        out = {
+            "name": self.name,
+            "start_ms": round((self.start - t0) * 1000.0, 3),
+            "duration_ms": round((end - self.start) * 1000.0, 3),
+        }
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [c.to_dict(t0) for c in self.children]
+        return out
+
+
+class Trace:
+    def __init__(self, name, profile=False, profile_top=25):
+        self.name = name
+        self.profile = profile
+        self.profile_top = profile_top
+        self.root = None
+        self._stack = []
+        self._token = None
+        self._profiler = None
+        self._profile_summary = None
+
+    def __enter__(self):
+        self.root = Span(self.name)
+        self._stack = [self.root]
+        self._token = _current.set(self)
+        if self.profile:
+            if _profile_lock.acquire(blocking=False):
+                self._profiler = cProfile.Profile()
+                try:
+                    self._profiler.enable()
+                except ValueError:
+                    # another profiler (e.g. a debugger) is already active
+                    self._profiler = None
+                    _profile_lock.release()
+            if self._profiler is None:
+                self.root.attrs["profile"] = "busy"
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler is not None:
+            self._profiler.disable()
+            _profile_lock.release()
+            self._profile_summary = profile_summary(self._profiler, self.profile_top)
+            self._profiler = None
+        while len(self._stack) > 1:
+            self._stack.pop().end = time.perf_counter()
+        self.root.end = time.perf_counter()
+        _current.reset(self._token)
+        return False
+
+    @property
+    def duration_ms(self):
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return (end - self.root.start) * 1000.0
+
+    def to_dict(self):
+        out = {
+            "pid": os.getpid(),
+            "wall_time": time.time() - self.duration_ms / 1000.0,
+            "total_ms": round(self.duration_ms, 3),
+            "spans": self.root.to_dict(self.root.start),
+        }
+        if self._profile_summary is not None:
+            out["profile"] = self._profile_summary
+        return out
+
+
+@contextlib.contextmanager
+def span(name, **attrs):
+    trace = _current.get()
+    if trace is None:
+        yield None
+        return
+    s = Span(name, attrs)
+    trace._stack[-1].children.append(s)
+    trace._stack.append(s)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        if trace._stack and trace._stack[-1] is s:
+            trace._stack.pop()
+
+
+def annotate(**attrs):
+    trace = _current.get()
+    if trace is not None:
+        trace._stack[-1].attrs.update(attrs)
+
+
+def profile_summary(profiler, top=25):
+    """Top functions by cumulative time as plain dicts."""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:top]
+    return [
+        {
+            "function": f"{os.path.basename(filename)}:{line}({func})",
+            "calls": nc,
+            "self_ms": round(tt * 1000.0, 3),
+            "cumulative_ms": round(ct * 1000.0, 3),
+        }
+        for (filename, line, func), (cc, nc, tt, ct, callers) in rows
+    ]
+
+
+class SlowestTraces:
+    """Bounded buffer with the `capacity` slowest traces seen by this process."""
+
+    def __init__(self, capacity=20):
+        self.capacity = capacity
+        self._heap = []
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self.offered = 0
+
+    def offer(self, trace):
+        duration = trace.duration_ms
+        with self._lock:
+            self.offered += 1
+            if self.capacity <= 0:
+                return False
+            if len(self._heap) >= self.capacity and duration <= self._heap[0][0]:
+                return False
+            # only traces that make the cut are serialised
+            item = (duration, next(self._seq), trace.to_dict())
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heapreplace(self._heap, item)
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            return [t for _, _, t in sorted(self._heap, key=lambda x: x[0], reverse=True)]
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
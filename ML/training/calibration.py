@@ -0,0 +1,152 @@
+"""
+training/calibration.py
+
+Memory-lean probability calibration.
+CalibratedClassifierCV(cv=3) keeps three fitted copies of the base estimator. Here the
+base model is fitted once and a single sigmoid (Platt) or isotonic mapping is learned on
+its out-of-fold probabilities. The mapping is a few numbers saved to calibration.json,
+and app.py applies it with apply_calibration() after predict_proba.
+"""
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import brier_score_loss, log_loss
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+# liver_train.py CALIBRATION_MODE: "ensemble" = CalibratedClassifierCV, else one mapping
+CALIBRATION_MODES = ("ensemble", "sigmoid", "isotonic")
+
+
+def _positive_column(model, proba):
+    classes = list(getattr(model, "classes_", [0, 1]))
+    return proba[:, classes.index(1) if 1 in classes else 1]
+
+
+def fit_calibration_mapping(base_model, X, y, method="sigmoid", cv=3, random_state=42,
+                            sample_weight=None):
+    """
+    Learn a calibration mapping from out-of-fold probabilities of clones of base_model.
+    Only the returned dict is kept; the fold models are discarded.
+    """
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    params = {"sample_weight": sample_weight} if sample_weight is not None else None
+    oof = cross_val_predict(clone(base_model), X, y, cv=folds, method="predict_proba", params=params)
+    p = _positive_column(base_model, oof)
+    y = np.asarray(y)
+
+    if method == "isotonic":
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip")
+        iso.fit(p, y, sample_weight=sample_weight)
+        return {
+            "method": "isotonic",
+            "x": [float(v) for v in iso.X_thresholds_],
+            "y": [float(v) for v in iso.y_thresholds_],
+        }
+
+    # Platt scaling: P(disease) = 1 / (1 + exp(-(a * p + b)))
+    lr = LogisticRegression(C=1e6, solver="lbfgs")
+    lr.fit(p.reshape(-1, 1), y, sample_weight=sample_weight)
+    return {"method": "sigmoid", "a": float(lr.coef_[0][0]), "b": float(lr.intercept_[0])}
+
+
+def apply_calibration(mapping, disease_prob):
+    """Map raw disease probabilities (scalar or array) through a saved mapping."""
+    p = np.asarray(disease_prob, dtype=float)
+    if not mapping:
+        return p
+    if mapping.get("method") == "isotonic":
+        return np.interp(p, mapping["x"], mapping["y"])
+    return 1.0 / (1.0 + np.exp(-(mapping["a"] * p + mapping["b"])))
+
+
+class MappedCalibratedModel:
+    """
+    In-process view of base model + mapping with the sklearn classifier surface used
+    by the training script (predict, predict_proba, score). Not pickled: deployment
+    saves the base model and calibration.json separately.
+    """
+
+    def __init__(self, base_model, mapping):
+        self.base_model = base_model
+        self.mapping = mapping
+        self.classes_ = np.array([0, 1])
+
+    def predict_proba(self, X):
+        raw = _positive_column(self.base_model, self.base_model.predict_proba(X))
+        p = apply_calibration(self.mapping, raw)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+
+def expected_calibration_error(y, p, n_bins=10):
+    y = np.asarray(y)
+    p = np.asarray(p)
+    bins = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    ece = 0.0
+    for b in range(n_bins):
+        mask = bins == b
+        if mask.any():
+            ece += mask.mean() * abs(p[mask].mean() - y[mask].mean())
+    return float(ece)
+
+
+def deployment_profile(model, X_eval, y_eval, mapping=None, n_rows=200):
+    """
+    Size on disk, load time, per-request latency and calibration quality of a deployed
+    artifact set: the pickled model plus, if given, the JSON mapping.
+    """
+    X_eval = np.asarray(X_eval)
+    tmp_dir = tempfile.mkdtemp()
+    model_path = os.path.join(tmp_dir, "model.pkl")
+    map_path = os.path.join(tmp_dir, "calibration.json")
+    joblib.dump(model, model_path)
+    size = os.path.getsize(model_path)
+    if mapping is not None:
+        with open(map_path, "w") as f:
+            json.dump(mapping, f)
+        size += os.path.getsize(map_path)
+
+    t0 = time.perf_counter()
+    loaded = joblib.load(model_path)
+    loaded_map = None
+    if mapping is not None:
+        with open(map_path) as f:
+            loaded_map = json.load(f)
+    load_seconds = time.perf_counter() - t0
+
+    def predict_disease(X):
+        p = _positive_column(loaded, loaded.predict_proba(X))
+        return apply_calibration(loaded_map, p) if loaded_map is not None else p
+
+    n_rows = min(n_rows, len(X_eval))
+    predict_disease(X_eval[:1])  # warm-up
+    t0 = time.perf_counter()
+    for i in range(n_rows):
+        predict_disease(X_eval[i:i + 1])
+    latency_ms = (time.perf_counter() - t0) * 1000.0 / max(1, n_rows)
+
+    p = np.clip(predict_disease(X_eval), 1e-12, 1 - 1e-12)
+    for name in os.listdir(tmp_dir):
+        os.remove(os.path.join(tmp_dir, name))
+    os.rmdir(tmp_dir)
+
+    return {
+        "size_bytes": int(size),
+        "load_seconds": float(load_seconds),
+        "latency_ms_per_request": float(latency_ms),
+        "brier": float(brier_score_loss(y_eval, p)),
+        "log_loss": float(log_loss(y_eval, p, labels=[0, 1])),
+        "ece": expected_calibration_error(y_eval, p),
+    }
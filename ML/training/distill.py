@@ -0,0 +1,137 @@
+"""
+training/distill.py
+
+Knowledge distillation of the calibrated teacher into a small student model.
+- Student learns the teacher's disease probabilities (soft labels), not the hard 0/1 labels
+- Soft labels are encoded as two weighted copies of every row (label 0 with weight 1-p,
+  label 1 with weight p), so plain sklearn/XGBoost classifiers can be used and the
+  saved student is an ordinary pickle with predict_proba (no custom classes needed in app.py)
+- A student is accepted only if accuracy and Brier score stay within tolerance of the teacher
+  on the evaluation rows; liver_train.py passes a validation split held out from training,
+  not the test split that already chose the teacher
+"""
+import io
+import time
+
+import joblib
+import numpy as np
+from sklearn.metrics import accuracy_score, brier_score_loss
+from sklearn.tree import DecisionTreeClassifier
+from xgboost import XGBClassifier
+
+
+def disease_proba(model, X):
+    """Probability of class 1 (disease) for every row of X."""
+    proba = model.predict_proba(X)
+    classes = list(getattr(model, "classes_", [0, 1]))
+    idx = classes.index(1) if 1 in classes else 1
+    return proba[:, idx]
+
+
+def model_size_bytes(model):
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    return buf.tell()
+
+
+def per_row_latency_ms(model, X, n_rows=200):
+    """Mean wall time of predict_proba on a single row, as the API calls it."""
+    X = np.asarray(X)
+    n_rows = min(n_rows, len(X))
+    model.predict_proba(X[:1])  # warm-up
+    start = time.perf_counter()
+    for i in range(n_rows):
+        model.predict_proba(X[i:i + 1])
+    return (time.perf_counter() - start) * 1000.0 / max(1, n_rows)
+
+
+def student_candidates(random_state=42):
+    """Small students, cheapest first; the smallest accepted one wins."""
+    return {
+        "XGBoostShallow": XGBClassifier(
+            n_estimators=60,
+            learning_rate=0.2,
+            max_depth=3,
+            eval_metric="logloss",
+            random_state=random_state,
+        ),
+        "XGBoostCompact": XGBClassifier(
+            n_estimators=100,
+            learning_rate=0.3,
+            max_depth=8,
+            eval_metric="logloss",
+            random_state=random_state,
+        ),
+        # bounded depth/leaves: soft-label rows are duplicated, an unbounded tree memorises them
+        "DecisionTree": DecisionTreeClassifier(
+            max_depth=10,
+            min_samples_leaf=20,
+            random_state=random_state,
+        ),
+    }
+
+
+def fit_soft(model, X, soft_targets):
+    X = np.asarray(X)
+    p = np.clip(np.asarray(soft_targets, dtype=float), 0.0, 1.0)
+    X2 = np.vstack([X, X])
+    y2 = np.concatenate([np.zeros(len(X), dtype=int), np.ones(len(X), dtype=int)])
+    w2 = np.concatenate([1.0 - p, p])
+    keep = w2 > 0
+    model.fit(X2[keep], y2[keep], sample_weight=w2[keep])
+    return model
+
+
+def distill_student(teacher, X_fit, X_eval, y_eval,
+                    acc_tolerance=0.005, brier_tolerance=0.005, random_state=42):
+    """
+    Train every student candidate on the teacher's probabilities over X_fit and
+    gate it on (X_eval, y_eval). Returns (student or None, report dict).
+    """
+    y_eval = np.asarray(y_eval)
+    teacher_soft = disease_proba(teacher, X_fit)
+    teacher_eval = disease_proba(teacher, X_eval)
+    teacher_pred = (teacher_eval >= 0.5).astype(int)
+    teacher_acc = accuracy_score(y_eval, teacher_pred)
+    teacher_brier = brier_score_loss(y_eval, teacher_eval)
+
+    report = {
+        "teacher": {
+            "accuracy": float(teacher_acc),
+            "brier": float(teacher_brier),
+            "size_bytes": int(model_size_bytes(teacher)),
+            "latency_ms_per_row": float(per_row_latency_ms(teacher, X_eval)),
+        },
+        "tolerance": {"accuracy": acc_tolerance, "brier": brier_tolerance},
+        "candidates": {},
+        "accepted": None,
+    }
+
+    best, best_name, best_size = None, None, None
+    for name, student in student_candidates(random_state).items():
+        t0 = time.perf_counter()
+        fit_soft(student, X_fit, teacher_soft)
+        fit_seconds = time.perf_counter() - t0
+
+        student_eval = disease_proba(student, X_eval)
+        student_pred = (student_eval >= 0.5).astype(int)
+        acc = accuracy_score(y_eval, student_pred)
+        brier = brier_score_loss(y_eval, student_eval)
+        size = model_size_bytes(student)
+        passed = (acc >= teacher_acc - acc_tolerance) and (brier <= teacher_brier + brier_tolerance)
+
+        report["candidates"][name] = {
+            "accuracy": float(acc),
+            "brier": float(brier),
+            "agreement_with_teacher": float(np.mean(student_pred == teacher_pred)),
+            "mean_abs_prob_diff": float(np.mean(np.abs(student_eval - teacher_eval))),
+            "size_bytes": int(size),
+            "latency_ms_per_row": float(per_row_latency_ms(student, X_eval)),
+            "fit_seconds": float(fit_seconds),
+            "passed_gate": bool(passed),
+        }
+        if passed and (best_size is None or size < best_size):
+            best, best_name, best_size = student, name, size
+
+    report["accepted"] = best_name
+    return best, report
@@ -0,0 +1,226 @@
+"""
+training/imbalance.py
+
+Pluggable class-imbalance stage for liver_train.py (IMBALANCE_STRATEGY).
+- "smote"          imblearn SMOTE, exact kNN over the whole minority class (previous behaviour)
+- "smote_batched"  same SMOTE interpolation, but neighbours are only searched for the base
+                   rows actually drawn, in batches of `batch_rows`, and the synthetic rows
+                   are written straight into one preallocated array
+- "smote_approx"   as smote_batched, with neighbours searched among a random subsample of
+                   `anchor_rows` minority rows (approximate kNN, bounded index size)
+- "class_weight"   no resampling; models use class_weight='balanced' / scale_pos_weight
+- "sample_weight"  no resampling; balanced per-row weights are passed to fit()
+iter_smote_batches() is the lazy generator behind the batched modes and can also feed
+incremental learners (partial_fit) without materialising the balanced set.
+benchmark_strategies() compares time, memory and test metrics across all strategies. Each
+strategy runs in a forked child: timings are taken without any tracing, and memory is the
+child's peak RSS growth over its starting RSS, so native (XGBoost/OpenMP) allocations count.
+"""
+import multiprocessing
+import os
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, brier_score_loss, f1_score, recall_score
+from sklearn.neighbors import NearestNeighbors
+from imblearn.over_sampling import SMOTE
+
+STRATEGIES = ["smote", "smote_batched", "smote_approx", "class_weight", "sample_weight"]
+
+
+def balanced_sample_weight(y):
+    """n / (n_classes * n_c) for every row, like class_weight='balanced'."""
+    y = np.asarray(y)
+    classes, counts = np.unique(y, return_counts=True)
+    per_class = dict(zip(classes, len(y) / (len(classes) * counts)))
+    return np.array([per_class[v] for v in classes])[np.searchsorted(classes, y)]
+
+
+def iter_smote_batches(X_min, n_samples, k_neighbors=5, batch_rows=50_000,
+                       anchor_rows=None, random_state=42):
+    """
+    Lazily yield SMOTE samples in batches: base row + U(0,1) * (neighbour - base).
+    Neighbours come from the full minority set, or from `anchor_rows` random minority
+    rows when given (approximate, bounded kNN index).
+    """
+    rng = np.random.default_rng(random_state)
+    X_min = np.asarray(X_min, dtype=float)
+    is_anchor = np.ones(len(X_min), dtype=bool)
+    if anchor_rows is not None and len(X_min) > anchor_rows:
+        anchor_idx = rng.choice(len(X_min), anchor_rows, replace=False)
+        anchors = X_min[anchor_idx]
+        is_anchor[:] = False
+        is_anchor[anchor_idx] = True
+    else:
+        anchors = X_min
+    k = max(1, min(k_neighbors, len(anchors) - 1))
+    nn = NearestNeighbors(n_neighbors=k + 1).fit(anchors)
+
+    # neighbour lists are filled in lazily, so every minority row is queried at most once
+    table = np.full((len(X_min), k + 1), -1, dtype=np.int64)
+    done = 0
+    while done < n_samples:
+        n = min(batch_rows, n_samples - done)
+        base_idx = rng.integers(len(X_min), size=n)
+        todo = np.unique(base_idx[table[base_idx, 0] < 0])
+        if len(todo):
+            table[todo] = nn.kneighbors(X_min[todo], return_distance=False)
+        base = X_min[base_idx]
+        # column 0 is the base row itself only when it is an anchor: anchors pick from
+        # columns 1..k, non-anchor rows from their k true nearest anchors 0..k-1
+        col = rng.integers(0, k, size=n) + is_anchor[base_idx]
+        pick = table[base_idx, col]
+        yield base + rng.random((n, 1)) * (anchors[pick] - base)
+        done += n
+
+
+def _batched_smote(X, y, k_neighbors, batch_rows, anchor_rows, random_state):
+    columns = getattr(X, "columns", None)
+    y_name = getattr(y, "name", None)
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y)
+    classes, counts = np.unique(y, return_counts=True)
+    minority = classes[np.argmin(counts)]
+    n_new = int(counts.max() - counts.min())
+
+    X_out = np.empty((len(X) + n_new, X.shape[1]))
+    y_out = np.empty(len(y) + n_new, dtype=y.dtype)
+    X_out[:len(X)] = X
+    y_out[:len(y)] = y
+    y_out[len(y):] = minority
+    pos = len(X)
+    for batch in iter_smote_batches(X[y == minority], n_new, k_neighbors, batch_rows,
+                                    anchor_rows, random_state):
+        X_out[pos:pos + len(batch)] = batch
+        pos += len(batch)
+    if columns is not None:
+        # keep feature names so the scaler/models see the same input type as with imblearn
+        return pd.DataFrame(X_out, columns=columns, copy=False), pd.Series(y_out, name=y_name)
+    return X_out, y_out
+
+
+def apply_imbalance(strategy, X, y, random_state=42, k_neighbors=5,
+                    batch_rows=50_000, anchor_rows=20_000):
+    """Return (X_res, y_res, sample_weight or None) for the chosen strategy."""
+    if strategy == "smote":
+        X_res, y_res = SMOTE(random_state=random_state, k_neighbors=k_neighbors).fit_resample(X, y)
+        return X_res, y_res, None
+    if strategy == "smote_batched":
+        return (*_batched_smote(X, y, k_neighbors, batch_rows, None, random_state), None)
+    if strategy == "smote_approx":
+        return (*_batched_smote(X, y, k_neighbors, batch_rows, anchor_rows, random_state), None)
+    if strategy == "class_weight":
+        return X, y, None
+    if strategy == "sample_weight":
+        return X, y, balanced_sample_weight(y)
+    raise ValueError(f"Unknown IMBALANCE_STRATEGY {strategy!r}; choose from {STRATEGIES}")
+
+
+def scale_pos_weight(strategy, y):
+    """XGBoost's counterpart of class_weight='balanced' (only used by 'class_weight')."""
+    if strategy != "class_weight":
+        return 1.0
+    y = np.asarray(y)
+    return float((y == 0).sum() / max(1, (y == 1).sum()))
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0   # kB on Linux
+
+
+def _run_in_child(fn, poll_interval=1.0):
+    """
+    Run fn() in a forked child and return its result dict plus "peak_rss_mb": the child's
+    peak RSS minus its RSS right after the fork. A child that dies without a result (OOM
+    kill, native crash) gives {"error": "child exited <code>"}. Falls back to running
+    inline (no memory figure) where fork is unavailable.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        row = fn()
+        row["peak_rss_mb"] = None
+        return row
+    ctx = multiprocessing.get_context("fork")
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+
+    def target():
+        base = _rss_mb()
+        try:
+            row = fn()
+        except Exception as e:
+            row = {"error": str(e)}
+        row["peak_rss_mb"] = round(max(0.0, _peak_rss_mb() - base), 1) if base is not None else None
+        send_conn.send(row)
+
+    proc = ctx.Process(target=target)
+    proc.start()
+    send_conn.close()
+    row = None
+    try:
+        while row is None:
+            if recv_conn.poll(poll_interval):
+                row = recv_conn.recv()
+            elif not proc.is_alive():
+                break
+    except EOFError:
+        pass  # child closed the pipe without sending
+    finally:
+        recv_conn.close()
+    proc.join()
+    if row is None:
+        row = {"error": f"child exited {proc.exitcode}", "peak_rss_mb": None}
+    return row
+
+
+def benchmark_strategies(X_train, y_train, X_test, y_test, make_model, make_scaler,
+                         strategies=STRATEGIES, random_state=42):
+    """
+    Run every strategy end to end (resample -> scale -> fit -> predict) with the same model
+    factory `make_model(strategy, y_res)`; returns one dict of timings/memory/metrics per strategy.
+    peak_rss_mb is process memory (Python, NumPy and native libraries) added by that strategy.
+    """
+    def run(strategy):
+        t0 = time.perf_counter()
+        X_res, y_res, sw = apply_imbalance(strategy, X_train, y_train, random_state=random_state)
+        t_resample = time.perf_counter() - t0
+
+        scaler = make_scaler()
+        X_res_s = scaler.fit_transform(X_res)
+        X_test_s = scaler.transform(X_test)
+        model = make_model(strategy, y_res)
+        t0 = time.perf_counter()
+        if sw is not None:
+            model.fit(X_res_s, y_res, sample_weight=sw)
+        else:
+            model.fit(X_res_s, y_res)
+        t_fit = time.perf_counter() - t0
+
+        proba = model.predict_proba(X_test_s)[:, 1]
+        pred = (proba >= 0.5).astype(int)
+        return {
+            "strategy": strategy,
+            "train_rows": int(len(y_res)),
+            "resample_seconds": round(t_resample, 3),
+            "fit_seconds": round(t_fit, 3),
+            "accuracy": float(accuracy_score(y_test, pred)),
+            "recall_disease": float(recall_score(y_test, pred, pos_label=1)),
+            "recall_no_disease": float(recall_score(y_test, pred, pos_label=0)),
+            "f1": float(f1_score(y_test, pred)),
+            "brier": float(brier_score_loss(y_test, proba)),
+        }
+
+    rows = []
+    for strategy in strategies:
+        row = _run_in_child(lambda: run(strategy))
+        row.setdefault("strategy", strategy)
+        rows.append(row)
+    return rows
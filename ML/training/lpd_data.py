@@ -0,0 +1,129 @@
+"""
+training/lpd_data.py
+
+Loading and cleaning of the Liver Patient Dataset (LPD), shared by liver_train.py and
+the tools built around it (synthetic data generator, out-of-core training).
+- CSV reading with encoding fallback
+- Column name normalisation (BOM / non-breaking spaces) and mapping of name variants
+  to the standard names Age, Gender, TB, DB, Alkphos, Sgpt, Sgot, TP, ALB, A_G, Result
+- Gender -> 1 (male) / 0 (female), Result 1 -> Category 1 (disease), 2 -> 0 (no disease)
+"""
+import numpy as np
+import pandas as pd
+
+ENCODINGS_TO_TRY = ["utf-8", "latin1", "iso-8859-1", "cp1252"]
+REQUIRED_COLUMNS = ['Age', 'Gender', 'TB', 'DB', 'Alkphos', 'Sgpt', 'Sgot', 'TP', 'ALB', 'A_G', 'Result']
+FEATURE_CANDIDATES = ['Age', 'Gender', 'TB', 'DB', 'Alkphos', 'Sgpt', 'Sgot', 'TP', 'ALB', 'A_G']
+
+
+def read_csv_any_encoding(path, encodings=ENCODINGS_TO_TRY, verbose=True, **kwargs):
+    """Try common encodings with the python engine (handles weird chars)."""
+    for enc in encodings:
+        try:
+            df = pd.read_csv(path, encoding=enc, engine="python", **kwargs)
+            if verbose:
+                print(f"    loaded with encoding: {enc}, shape: {df.shape}")
+            return df
+        except Exception as e:
+            if verbose:
+                print(f"    failed with {enc}: {e}")
+    raise RuntimeError("Failed to read dataset in tried encodings. Please check file or provide a different path/encoding.")
+
+
+def detect_encoding(path, encodings=ENCODINGS_TO_TRY, sample_bytes=1 << 20):
+    """First encoding that decodes the head of the file (for chunked readers)."""
+    with open(path, "rb") as f:
+        head = f.read(sample_bytes)
+    for enc in encodings:
+        try:
+            head.decode(enc)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return encodings[-1]
+
+
+def normalize_column_names(columns):
+    """Strip BOM/non-breaking spaces, spaces -> underscores."""
+    return [c.strip().replace('\xa0', ' ').replace('\u00A0', ' ').replace(' ', '_') for c in columns]
+
+
+def map_columns(columns):
+    """Map standard name -> actual (normalised) column name for known variants."""
+    col_map = {}
+    for c in columns:
+        lc = c.lower()
+        if 'age' in lc and 'age' not in col_map:
+            col_map['Age'] = c
+        if 'gender' in lc and 'gender' not in col_map:
+            col_map['Gender'] = c
+        if 'tb' in lc or 'total bilirubin' in lc:
+            col_map['TB'] = c
+        if 'db' in lc or 'direct bilirubin' in lc:
+            col_map['DB'] = c
+        if 'alk' in lc or 'alkphos' in lc or 'alkaline' in lc:
+            col_map['Alkphos'] = c
+        if 'sgpt' in lc or 'alanine' in lc:
+            col_map['Sgpt'] = c
+        if 'sgot' in lc or 'aspartate' in lc:
+            col_map['Sgot'] = c
+        if 'tp' in lc or 'total protein' in lc or 'total_protiens' in lc:
+            col_map['TP'] = c
+        if 'alb' in lc and 'a/g' not in lc:
+            col_map['ALB'] = c
+        if 'a/g' in lc or 'a/g ratio' in lc or 'ag_ratio' in lc or 'a_g' in lc:
+            col_map['A_G'] = c
+        if 'result' in lc or 'selector' in lc:
+            col_map['Result'] = c
+    return col_map
+
+
+def standardize_columns(df):
+    """Normalise and rename the columns of a raw frame; returns (df, col_map)."""
+    df.columns = normalize_column_names(df.columns)
+    col_map = map_columns(df.columns)
+    rename_dict = {v: k for k, v in col_map.items()}
+    return df.rename(columns=rename_dict), col_map
+
+
+def gender_to_int(series):
+    series = series.replace({'M': 'Male', 'F': 'Female', 'm': 'Male', 'f': 'Female'})
+    return series.map(
+        lambda x: 1 if str(x).strip().lower().startswith('m')
+        else (0 if str(x).strip().lower().startswith('f') else np.nan)
+    )
+
+
+def clean_frame(df):
+    """Strip strings, encode Gender, derive the 0/1 Category target from Result."""
+    for c in df.select_dtypes(include=['object']).columns:
+        df[c] = df[c].astype(str).str.strip()
+
+    if 'Gender' in df.columns:
+        df['Gender'] = gender_to_int(df['Gender'])
+
+    if 'Result' not in df.columns:
+        raise ValueError("Dataset must contain a Result column (target).")
+    df['Result'] = pd.to_numeric(df['Result'], errors='coerce')
+    # 1 -> 1 (disease), 2 -> 0 (no disease); rows without a Result are dropped
+    df = df.dropna(subset=['Result']).copy()
+    df['Category'] = df['Result'].map(lambda x: 1 if int(x) == 1 else 0)
+    df = df.dropna(subset=['Category'])
+    df['Category'] = df['Category'].astype(int)
+    return df
+
+
+def select_features(df, verbose=True):
+    features = []
+    for key in FEATURE_CANDIDATES:
+        if key in df.columns:
+            features.append(key)
+        elif verbose:
+            print(f"⚠ Column {key} not found — will attempt to continue without it.")
+    return features
+
+
+def to_numeric_frame(X):
+    for col in X.columns:
+        X[col] = pd.to_numeric(X[col], errors='coerce')
+    return X
@@ -0,0 +1,528 @@
+"""
+training/out_of_core.py
+
+Out-of-core training mode for liver_train.py (OUT_OF_CORE=1), for datasets larger than RAM.
+- The CSV (or Parquet) file is only ever read in chunks of `chunk_rows`; the same
+  cleaning as the in-memory pipeline is applied per chunk (training/lpd_data.py)
+- Train/holdout/tuning split is a seeded per-chunk coin flip, so every pass over the file
+  sees the same split without keeping row ids in memory. The tuning part (tune_size > 0,
+  off by default) is used only for threshold tuning, never for training or model selection
+- Pass 1 parses the file once and spills the cleaned numeric rows to flat binary files
+  (8 bytes per value) next to the outputs; all later passes stream those in chunks
+- Pass 1 also keeps a fixed-size uniform reservoir sample of training rows; the imputation
+  medians and the RobustScaler median/IQR are estimated from it (streaming quantile
+  estimates, error ~1/sqrt(reservoir_rows)) and class counts give balanced sample weights
+- Models (`models`, liver_train.py OOC_MODELS): "sgd" = SGD logistic regression via
+  partial_fit over every training chunk; "xgb_reservoir" = XGBoost fitted in memory on the
+  training reservoir sample; "xgb_extmem" = XGBoost in external-memory mode over all
+  training rows (ExtMemQuantileDMatrix over a chunk iterator, pages cached on disk).
+  Default: sgd + xgb_reservoir
+- Holdout is streamed: confusion matrices are accumulated chunk by chunk
+- Tuning rows that exactly duplicate a training row are dropped: pass 1 adds every training
+  row hash to a fixed-size Bloom filter (RowHashFilter, `dedup_filter_mb`), which never
+  misses a training row; a false positive only drops an extra tuning row. A uniform
+  reservoir sample of `reservoir_rows` of the remaining (label, disease probability) pairs
+  of the best model is written to oos_scores.npz and feeds the threshold tuning
+  (training/thresholds.py)
+- Writes the same artifact set as the in-memory pipeline. There is no SMOTE (balanced
+  sample weights instead) and no CalibratedClassifierCV; any stale calibration.json or
+  student_model.pkl is removed because they belong to a different model
+With the default models, peak memory is bounded by chunk_rows + reservoir_rows +
+dedup_filter_mb, independent of the input size (measured with tuning on: peak RSS ~480 MB
+at 300k rows, ~515 MB at 6M, ~510 MB at 12M). The price of the bound is that XGBoost
+only sees reservoir_rows training rows and the Bloom filter's false-positive rate (printed
+per run) rises once the training rows approach dedup_filter_mb * 2M.
+"xgb_extmem" is NOT bounded: XGBoost external memory keeps per-row labels, weights and
+gradients (tens of bytes per training row) and mmaps its on-disk pages, so peak RSS grows
+linearly with the training rows (measured: ~320 MB at 30k rows, ~480 MB at 2M, ~660 MB
+at 6M). Opt in only where that growth is acceptable.
+"""
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import LabelEncoder, RobustScaler
+from xgboost import XGBClassifier
+
+from training.lpd_data import (
+    detect_encoding, normalize_column_names, map_columns, clean_frame,
+    FEATURE_CANDIDATES, REQUIRED_COLUMNS
+)
+from training.report import save_confusion_matrix, write_pdf_report
+from training.thresholds import (
+    save_oos_scores, tune_thresholds, row_hashes,
+    matches_defaults as thresholds_match_defaults, print_summary as print_threshold_summary
+)
+
+LABEL_NAMES = ["No_Disease", "Disease"]
+MODELS = ("sgd", "xgb_reservoir", "xgb_extmem")
+DEFAULT_MODELS = ("sgd", "xgb_reservoir")
+
+
+# ---------------- Chunked input ----------------
+class ChunkSource:
+    """Re-iterable chunked view of the dataset with a deterministic train/holdout/tuning split."""
+
+    def __init__(self, path, chunk_rows=200_000, test_size=0.20, random_state=42, tune_size=0.0):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.test_size = test_size
+        self.tune_size = tune_size
+        self.random_state = random_state
+        self.is_parquet = path.lower().endswith((".parquet", ".pq"))
+        self.encoding = None if self.is_parquet else detect_encoding(path)
+
+        header = self._header()
+        self.col_map = map_columns(normalize_column_names(header))
+        missing_required = [r for r in REQUIRED_COLUMNS if r not in self.col_map]
+        if missing_required:
+            print("⚠ Missing expected columns (attempting to proceed):", missing_required)
+        self.features = [k for k in FEATURE_CANDIDATES if k in self.col_map]
+
+    def _header(self):
+        if self.is_parquet:
+            import pyarrow.parquet as pq
+            return list(pq.ParquetFile(self.path).schema_arrow.names)
+        return list(pd.read_csv(self.path, encoding=self.encoding, nrows=0).columns)
+
+    def _raw_chunks(self):
+        if self.is_parquet:
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(self.path).iter_batches(batch_size=self.chunk_rows):
+                yield batch.to_pandas().astype(str)
+        else:
+            yield from pd.read_csv(self.path, encoding=self.encoding, dtype=str,
+                                   chunksize=self.chunk_rows)
+
+    def parsed_chunks(self):
+        """Yield (X float ndarray with NaN, y int ndarray, holdout mask, tuning mask) per chunk."""
+        rename = {v: k for k, v in self.col_map.items()}
+        for i, df in enumerate(self._raw_chunks()):
+            df.columns = normalize_column_names(df.columns)
+            df = clean_frame(df.rename(columns=rename))
+            X = df[self.features].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+            y = df['Category'].to_numpy(dtype=int)
+            rng = np.random.default_rng([self.random_state, i])
+            draw = rng.random(len(y))
+            holdout = draw < self.test_size
+            yield X, y, holdout, ~holdout & (draw < self.test_size + self.tune_size)
+
+
+class SpilledSplit:
+    """
+    Parsed train/holdout/tuning rows spilled to flat binary files during pass 1, so later
+    passes read fixed-size float chunks instead of re-parsing and re-cleaning the CSV.
+    """
+
+    def __init__(self, work_dir, n_features, chunk_rows):
+        self.n_features = n_features
+        self.chunk_rows = chunk_rows
+        self.paths = {
+            part: (os.path.join(work_dir, f"{part}_X.f64"), os.path.join(work_dir, f"{part}_y.i8"))
+            for part in ("train", "test", "tune")
+        }
+        self.rows = {"train": 0, "test": 0, "tune": 0}
+        self._files = {part: (open(px, "wb"), open(py, "wb")) for part, (px, py) in self.paths.items()}
+
+    def write(self, part, X, y):
+        fx, fy = self._files[part]
+        np.ascontiguousarray(X, dtype=np.float64).tofile(fx)
+        np.asarray(y, dtype=np.int8).tofile(fy)
+        self.rows[part] += len(y)
+
+    def close(self):
+        for fx, fy in self._files.values():
+            fx.close()
+            fy.close()
+
+    def chunks(self, part):
+        """Yield (X, y) chunks of at most chunk_rows rows for 'train', 'test' or 'tune'."""
+        px, py = self.paths[part]
+        with open(px, "rb") as fx, open(py, "rb") as fy:
+            while True:
+                y = np.fromfile(fy, dtype=np.int8, count=self.chunk_rows).astype(int)
+                if len(y) == 0:
+                    break
+                X = np.fromfile(fx, dtype=np.float64, count=len(y) * self.n_features)
+                yield X.reshape(len(y), self.n_features), y
+
+
+class Reservoir:
+    """Uniform fixed-size sample of a stream (keeps the rows with the smallest random keys)."""
+
+    def __init__(self, size, random_state=42):
+        self.size = size
+        self.rng = np.random.default_rng(random_state)
+        self.X = None
+        self.y = None
+        self.keys = None
+
+    def add(self, X, y):
+        keys = self.rng.random(len(y))
+        if self.X is None:
+            self.X, self.y, self.keys = X, y, keys
+        else:
+            self.X = np.vstack([self.X, X])
+            self.y = np.concatenate([self.y, y])
+            self.keys = np.concatenate([self.keys, keys])
+        if len(self.keys) > self.size:
+            keep = np.argpartition(self.keys, self.size)[:self.size]
+            self.X, self.y, self.keys = self.X[keep], self.y[keep], self.keys[keep]
+
+
+class RowHashFilter:
+    """
+    Bloom filter over row hashes with a fixed `size_mb` of bits, however many rows are
+    added. contains() has no false negatives; false positives grow with the rows added.
+    """
+
+    def __init__(self, size_mb=16, n_hashes=4):
+        self.n_bits = int(size_mb * 8 * 1024 * 1024)
+        self.bits = np.zeros(self.n_bits // 8, dtype=np.uint8)
+        self.n_hashes = n_hashes
+        self.added = 0
+
+    def _positions(self, hashes):
+        # double hashing: h1 + i * h2 from the two halves of the 64-bit row hash
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        return [(h1 + np.uint64(i) * h2) % np.uint64(self.n_bits) for i in range(self.n_hashes)]
+
+    def add(self, hashes):
+        for pos in self._positions(hashes):
+            byte, bit = pos >> np.uint64(3), (pos & np.uint64(7)).astype(np.uint8)
+            for b in range(8):
+                # OR with a constant, so repeated indices are harmless
+                self.bits[byte[bit == b]] |= np.uint8(1 << b)
+        self.added += len(hashes)
+
+    def contains(self, hashes):
+        found = np.ones(len(hashes), dtype=bool)
+        for pos in self._positions(hashes):
+            found &= ((self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1).astype(bool)
+        return found
+
+    def false_positive_rate(self):
+        return float((1.0 - np.exp(-self.n_hashes * self.added / self.n_bits)) ** self.n_hashes)
+
+
+def _impute(X, medians):
+    X = X.copy()
+    nan_r, nan_c = np.nonzero(np.isnan(X))
+    X[nan_r, nan_c] = medians[nan_c]
+    return X
+
+
+class _ExtMemIter(xgb.DataIter):
+    """Feeds scaled, weighted training chunks to XGBoost; pages are cached under cache_dir."""
+
+    def __init__(self, data, medians, scaler, class_weight, cache_dir):
+        self.data = data
+        self.medians = medians
+        self.scaler = scaler
+        self.class_weight = class_weight
+        self._it = None
+        super().__init__(cache_prefix=os.path.join(cache_dir, "xgb_cache"))
+
+    def next(self, input_data):
+        if self._it is None:
+            self._it = self.data.chunks("train")
+        try:
+            X, y = next(self._it)
+        except StopIteration:
+            return False
+        input_data(
+            data=self.scaler.transform(_impute(X, self.medians)),
+            label=y, weight=self.class_weight[y]
+        )
+        return True
+
+    def reset(self):
+        self._it = None
+
+
+def _booster_to_classifier(booster, tmp_dir):
+    """Wrap a raw Booster as an XGBClassifier so app.py can keep calling predict_proba."""
+    path = os.path.join(tmp_dir, "booster.json")
+    booster.save_model(path)
+    clf = XGBClassifier()
+    clf.load_model(path)
+    return clf
+
+
+def _report_from_confusion(cm):
+    """Text in the layout of sklearn's classification_report, built from counts only."""
+    lines = [f"{'':>12} {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}", ""]
+    total = cm.sum()
+    for k, name in enumerate(LABEL_NAMES):
+        tp = cm[k, k]
+        prec = tp / cm[:, k].sum() if cm[:, k].sum() else 0.0
+        rec = tp / cm[k, :].sum() if cm[k, :].sum() else 0.0
+        f1 = 2 * prec * rec / (prec + rec) if prec + rec else 0.0
+        lines.append(f"{name:>12} {prec:9.2f} {rec:9.2f} {f1:9.2f} {cm[k, :].sum():9d}")
+    lines += ["", f"{'accuracy':>12} {'':>9} {'':>9} {np.trace(cm) / max(total, 1):9.2f} {total:9d}"]
+    return "\n".join(lines)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is kB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# ---------------- Pipeline ----------------
+def run_out_of_core(data_file, output_dir, chunk_rows=200_000, test_size=0.20,
+                    random_state=42, reservoir_rows=200_000, sgd_epochs=3, xgb_rounds=200,
+                    tune_size=0.0, models=DEFAULT_MODELS, dedup_filter_mb=16):
+    unknown = [m for m in models if m not in MODELS]
+    if unknown or not models:
+        raise ValueError(f"Unknown out-of-core models {unknown}; choose from {MODELS}")
+    os.makedirs(output_dir, exist_ok=True)
+    t_start = time.time()
+    print("📥 Out-of-core training on:", data_file, f"(chunks of {chunk_rows} rows)")
+    source = ChunkSource(data_file, chunk_rows, test_size, random_state, tune_size)
+    features = source.features
+    print("   encoding:", source.encoding or "parquet", "| features:", features)
+
+    # spill files and the XGBoost page cache live here for the duration of the run
+    work_dir = tempfile.mkdtemp(prefix="lpd_ooc_", dir=output_dir)
+    try:
+        return _run_passes(source, work_dir, output_dir, t_start, chunk_rows,
+                           random_state, reservoir_rows, sgd_epochs, xgb_rounds,
+                           tuple(models), dedup_filter_mb)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_passes(source, work_dir, output_dir, t_start, chunk_rows,
+                random_state, reservoir_rows, sgd_epochs, xgb_rounds, wanted, dedup_filter_mb):
+    features = source.features
+    tune = source.tune_size > 0
+
+    # ---- Pass 1: parse once -> spill files, counts, reservoir -> medians, scaler, weights ----
+    print("\n📊 Pass 1: parsing + streaming statistics...")
+    data = SpilledSplit(work_dir, len(features), chunk_rows)
+    reservoir = Reservoir(reservoir_rows, random_state)
+    class_counts = np.zeros(2, dtype=np.int64)
+    train_filter = RowHashFilter(dedup_filter_mb) if tune else None
+    try:
+        for X, y, holdout, tuning in source.parsed_chunks():
+            data.write("test", X[holdout], y[holdout])
+            data.write("tune", X[tuning], y[tuning])
+            train = ~(holdout | tuning)
+            X, y = X[train], y[train]
+            data.write("train", X, y)
+            class_counts += np.bincount(y, minlength=2)
+            reservoir.add(X, y)
+            if tune:
+                train_filter.add(np.unique(row_hashes(X)))
+    finally:
+        data.close()
+    n_test = data.rows["test"]
+    n_train = int(class_counts.sum())
+    if n_train == 0 or n_test == 0:
+        raise RuntimeError("Out-of-core split produced an empty train or holdout set.")
+    print("   Train rows:", n_train, "| holdout rows:", n_test, "| tuning rows:", data.rows["tune"],
+          "| class counts:", class_counts.tolist())
+
+    medians = np.nanmedian(reservoir.X, axis=0)
+    medians = np.where(np.isnan(medians), 0.0, medians)
+    scaler = RobustScaler().fit(_impute(reservoir.X, medians))
+    class_weight = n_train / (2.0 * np.maximum(class_counts, 1))
+    print("   Medians (reservoir estimate):", {k: round(float(v), 3) for k, v in zip(features, medians)})
+
+    feature_order = list(features)
+    joblib.dump(feature_order, os.path.join(output_dir, "feature_order.pkl"))
+    with open(os.path.join(output_dir, "feature_order.json"), "w") as f:
+        json.dump(feature_order, f, indent=2)
+    joblib.dump(scaler, os.path.join(output_dir, "scaler.pkl"))
+    label_encoder = LabelEncoder().fit([0, 1])
+    joblib.dump(label_encoder, os.path.join(output_dir, "label_encoder.pkl"))
+    label_map = {0: "No_Disease", 1: "Disease"}
+    with open(os.path.join(output_dir, "label_mapping.json"), "w") as f:
+        json.dump(label_map, f, indent=2)
+
+    def transform(X):
+        return scaler.transform(_impute(X, medians))
+
+    # ---- Pass 2: incremental / external-memory training ----
+    models = {}
+    xgb_params = {
+        "objective": "binary:logistic", "eval_metric": "logloss",
+        "tree_method": "hist", "max_depth": 4, "eta": 0.1,
+        "subsample": 0.8, "colsample_bytree": 0.8, "seed": random_state,
+    }
+    if "sgd" in wanted:
+        print("\n🚀 Pass 2: SGD logistic regression (partial_fit, epochs =", sgd_epochs, ")")
+        try:
+            sgd = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=random_state)
+            for _ in range(sgd_epochs):
+                for X, y in data.chunks("train"):
+                    sgd.partial_fit(transform(X), y, classes=np.array([0, 1]),
+                                    sample_weight=class_weight[y])
+            models["SGDLogistic"] = sgd
+        except Exception as e:
+            print("   Training SGDLogistic failed:", e)
+
+    if "xgb_reservoir" in wanted:
+        print("🚀 Pass 2: XGBoost on the training reservoir (", len(reservoir.y), "rows, rounds =", xgb_rounds, ")")
+        try:
+            dres = xgb.DMatrix(transform(reservoir.X), label=reservoir.y, weight=class_weight[reservoir.y])
+            booster = xgb.train(xgb_params, dres, num_boost_round=xgb_rounds)
+            del dres
+            models["XGBoostReservoir"] = _booster_to_classifier(booster, work_dir)
+        except Exception as e:
+            print("   Training XGBoostReservoir failed:", e)
+
+    if "xgb_extmem" in wanted:
+        print("🚀 Pass 2: XGBoost external memory over all training rows (rounds =", xgb_rounds, ")")
+        try:
+            it = _ExtMemIter(data, medians, scaler, class_weight, work_dir)
+            dtrain = xgb.ExtMemQuantileDMatrix(it, max_bin=256)
+            booster = xgb.train(xgb_params, dtrain, num_boost_round=xgb_rounds)
+            del dtrain
+            models["XGBoostExtMem"] = _booster_to_classifier(booster, work_dir)
+        except Exception as e:
+            print("   Training XGBoostExtMem failed:", e)
+    if not models:
+        raise RuntimeError("No out-of-core model could be trained.")
+
+    # ---- Pass 3: streamed holdout evaluation ----
+    print("\n🧪 Pass 3: streamed holdout evaluation...")
+    cms = {name: np.zeros((2, 2), dtype=np.int64) for name in models}
+    for X, y in data.chunks("test"):
+        Xs = transform(X)
+        for name, model in models.items():
+            pred = model.predict(Xs).astype(int)
+            cms[name] += np.bincount(2 * y + pred, minlength=4).reshape(2, 2)
+    perfs = []
+    for name, cm in cms.items():
+        acc = float(np.trace(cm) / cm.sum())
+        perfs.append((name, models[name], acc))
+        print(f"   {name}: holdout accuracy {acc:.4f}")
+        print(_report_from_confusion(cm))
+        save_confusion_matrix(cm, f"{name} - Test Confusion Matrix",
+                              os.path.join(output_dir, f"{name}_confusion.png"))
+    perfs.sort(key=lambda p: p[2], reverse=True)
+    best_name, best_model, best_acc = perfs[0]
+    alt_model = perfs[1][1] if len(perfs) > 1 else None
+    print("\n🏆 Best model:", best_name, "| Holdout Accuracy:", best_acc)
+
+    # ---- Pass 4: per-row holdout outputs for the admin UI, written in append mode ----
+    results_path = os.path.join(output_dir, "model_test_results.csv")
+    sample_path = os.path.join(output_dir, "test_data_sample.csv")
+    next_id = 1001
+    first = True
+    for X, y in data.chunks("test"):
+        X_imp = _impute(X, medians)
+        proba = best_model.predict_proba(scaler.transform(X_imp))
+        pred = proba.argmax(axis=1)
+        frame = pd.DataFrame(X_imp, columns=features)
+        actual = pd.Series(y).map({0: "No_Disease", 1: "Disease"})
+        results = frame.copy()
+        results['Actual_Label'] = actual
+        results['Predicted_Label'] = pd.Series(pred).map({0: "No_Disease", 1: "Disease"})
+        results['Probability'] = proba.max(axis=1)
+        results['Correct'] = results['Actual_Label'] == results['Predicted_Label']
+        results.to_csv(results_path, index=False, mode="w" if first else "a", header=first)
+        sample = frame.copy()
+        sample.insert(0, 'patient_id', range(next_id, next_id + len(sample)))
+        sample['true_label'] = actual
+        sample.to_csv(sample_path, index=False, mode="w" if first else "a", header=first)
+        next_id += len(sample)
+        first = False
+    print("Saved:", results_path, "and", sample_path, "| rows:", next_id - 1001)
+
+    # ---- Pass 5: threshold tuning on the tuning rows not seen in training ----
+    thresholds_path = os.path.join(output_dir, "thresholds.json")
+    oos_path = os.path.join(output_dir, "oos_scores.npz")
+    thresholds_result = None
+    if tune:
+        # bounded sample of tuning scores; the full tuning part is never held in memory
+        oos = Reservoir(reservoir_rows, random_state + 1)
+        n_unseen = 0
+        for X, y in data.chunks("tune"):
+            unseen = ~train_filter.contains(row_hashes(X))
+            X, y = X[unseen], y[unseen]
+            n_unseen += len(y)
+            if len(y):
+                oos.add(best_model.predict_proba(transform(X))[:, 1:2], y.astype(np.int8))
+        print(f"\n🎚  Tuning rows: {data.rows['tune']}, {n_unseen} left after dropping duplicates of train rows "
+              f"(filter false-positive rate ~{train_filter.false_positive_rate():.2e})")
+        if n_unseen:
+            oos_y, oos_p = oos.y, oos.X[:, 0]
+            save_oos_scores(oos_path, oos_y, oos_p)
+            print("   Tuning risk bands and second-opinion threshold...")
+            try:
+                thresholds_result = tune_thresholds(
+                    oos_y, oos_p, output_dir,
+                    source=f"out-of-core tuning split (reservoir sample of {len(oos_y)} of {n_unseen} "
+                           "rows, duplicates of train dropped)"
+                )
+                print_threshold_summary(thresholds_result)
+            except Exception as e:
+                print("   Threshold tuning failed:", e)
+        del oos
+    del train_filter
+    # scores and cut-points from a previous model; app.py falls back to its defaults
+    if thresholds_result is None:
+        for stale in (thresholds_path, os.path.join(output_dir, "thresholds_curves.png")):
+            if os.path.exists(stale):
+                os.remove(stale)
+    if not tune and os.path.exists(oos_path):
+        os.remove(oos_path)
+
+    # ---- Artifacts, metrics, report ----
+    final_cm_path = save_confusion_matrix(
+        cms[best_name], f"Final Model ({best_name}) Confusion Matrix",
+        os.path.join(output_dir, f"final_confusion_{best_name}.png"), cmap="Purples", figsize=(6, 5)
+    )
+    joblib.dump(best_model, os.path.join(output_dir, "best_hcv_model.pkl"))
+    if alt_model is not None:
+        joblib.dump(alt_model, os.path.join(output_dir, "alt_model.pkl"))
+    for stale in ("calibration.json", "student_model.pkl"):
+        stale_path = os.path.join(output_dir, stale)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+    train_acc = float(np.mean(best_model.predict(transform(reservoir.X)) == reservoir.y))
+    metrics = {
+        "best_model": best_name,
+        "test_accuracy": best_acc,
+        # no augmentation out of core: accuracy on the training reservoir sample
+        "train_accuracy_augmented": train_acc,
+        "n_train": n_train,
+        "n_test": int(n_test),
+        "n_tune": int(data.rows["tune"]),
+        "mode": "out_of_core",
+        "chunk_rows": chunk_rows,
+        "reservoir_rows": int(len(reservoir.y)),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "seconds": round(time.time() - t_start, 1),
+        "thresholds": ("tuned" if thresholds_result is not None
+                       and not thresholds_match_defaults(thresholds_result) else "default"),
+    }
+    with open(os.path.join(output_dir, "metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+
+    report_name = os.path.join(output_dir, f"Training_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+    write_pdf_report(report_name, [
+        f"Best Model: {best_name} (out-of-core)",
+        f"Final Test Accuracy: {best_acc:.4f}",
+        f"Train accuracy on reservoir sample: {train_acc:.4f}",
+        f"Rows: train {n_train}, holdout {n_test} | chunk rows: {chunk_rows}",
+        f"Peak RSS: {metrics['peak_rss_mb']} MB",
+    ], final_cm_path, _report_from_confusion(cms[best_name]))
+    print("Saved PDF report:", report_name)
+    print(f"\n🎉 Out-of-core training finished in {metrics['seconds']}s "
+          f"(peak RSS {metrics['peak_rss_mb']} MB). Artifacts in:", output_dir)
+    return metrics
@@ -0,0 +1,83 @@
+"""
+training/report.py
+
+Confusion-matrix images and the PDF training report, shared by the in-memory
+(liver_train.py) and out-of-core (training/out_of_core.py) pipelines.
+"""
+import os
+
+import matplotlib.pyplot as plt
+import seaborn as sns
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+
+def save_confusion_matrix(cm, title, path, cmap="Blues", figsize=(5, 4)):
+    plt.figure(figsize=figsize)
+    sns.heatmap(
+        cm, annot=True, fmt="d", cmap=cmap,
+        xticklabels=["No", "Yes"], yticklabels=["No", "Yes"]
+    )
+    plt.title(title)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+    return path
+
+
+def save_threshold_curves(curves, risk_bands, path):
+    """Precision / recall / NPV / cost against the disease threshold, with the chosen band edges."""
+    fig, ax = plt.subplots(figsize=(7, 4.5))
+    for key in ("precision", "recall", "npv", "specificity"):
+        ax.plot(curves["threshold"], [v if v is not None else float("nan") for v in curves[key]], label=key)
+    ax.set_xlabel("disease probability threshold")
+    ax.set_ylim(0, 1.02)
+    cost_ax = ax.twinx()
+    cost_ax.plot(curves["threshold"], curves["cost"], color="black", linestyle=":", label="cost / row")
+    cost_ax.set_ylabel("expected cost per row")
+    edges = {
+        "moderate": risk_bands["disease_moderate"],
+        "high": risk_bands["disease_high"],
+        "low (healthy)": 1.0 - risk_bands["healthy_low"],
+        "medium (healthy)": 1.0 - risk_bands["healthy_medium"],
+    }
+    for name, x in edges.items():
+        ax.axvline(x, color="grey", linewidth=0.8, linestyle="--")
+        ax.text(x, 0.02, name, rotation=90, fontsize=7, va="bottom")
+    ax.legend(loc="lower left", fontsize=8)
+    ax.set_title("Threshold sweep (out-of-sample)")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def write_pdf_report(path, lines, image_path, report_str):
+    """Title, one line per entry of `lines`, the final confusion matrix and the classification report."""
+    c = canvas.Canvas(path, pagesize=letter)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, 750, "Liver Disease Model — Training Report")
+
+    c.setFont("Helvetica", 11)
+    ypos = 730
+    for line in lines:
+        c.drawString(50, ypos, line)
+        ypos -= 15
+
+    if image_path and os.path.exists(image_path):
+        try:
+            c.drawImage(image_path, 50, 350, width=480, preserveAspectRatio=True)
+        except Exception:
+            pass
+
+    c.setFont("Helvetica", 9)
+    ypos = 320
+    for line in report_str.splitlines():
+        c.drawString(40, ypos, line[:120])
+        ypos -= 12
+        if ypos < 60:
+            c.showPage()
+            ypos = 740
+
+    c.save()
+    return path
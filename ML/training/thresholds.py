@@ -0,0 +1,331 @@
+"""
+training/thresholds.py
+
+Threshold and risk-band tuning over out-of-sample disease probabilities.
+- threshold_curves() sorts the scores once and derives TP/FP/FN/TN at every distinct
+  threshold from cumulative sums: O(n log n) for the whole sweep, no re-prediction
+- curve_metrics() adds precision, recall, specificity, NPV and expected cost
+  (cost_fn * FN + cost_fp * FP per row) at every cut
+- recommend_cutpoints() picks the app.py risk-band edges and the second-opinion confidence
+  threshold from precision / NPV / error-rate targets. A cut is only accepted if every
+  stricter cut with at least `min_support` rows also meets the target (running min/max),
+  so a few lucky rows at the top of the ranking cannot choose it. Edges with no
+  qualifying cut keep their defaults; bands are then widened to `min_band_width`
+- Tuned cuts only move away from their defaults in the safe direction (SAFE_DIRECTION):
+  disease edges down (more patients Moderate / High), healthy edges and the second-opinion
+  cut up (fewer patients Low / Medium, alt model consulted more often). A cut tuned the
+  other way is replaced by its default and noted, unless the target
+  allow_less_conservative=1 is given explicitly
+- row_hashes() / unseen_rows() drop tuning rows that are exact feature duplicates of
+  training rows, so the scores being tuned on are really out-of-sample
+- tune_thresholds() writes thresholds.json (cut-points, targets, downsampled curves) and a
+  curves plot; app.py loads the JSON at startup via load_thresholds()
+
+The disease "Mild" edge stays at 0.50: it is the argmax decision boundary, not a band choice.
+
+CLI (re-tune from saved scores without retraining):
+    python -m training.thresholds training_output/oos_scores.npz [--out DIR] [--target k=v ...]
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# compute_risk_label() semantics:
+#   predicted healthy: healthy_prob >  healthy_low -> Low, >= healthy_medium -> Medium, else Borderline
+#   predicted disease: disease_prob <  disease_mild -> Borderline, < disease_moderate -> Mild,
+#                      < disease_high -> Moderate, else High
+DEFAULT_RISK_BANDS = {
+    "healthy_low": 0.85,
+    "healthy_medium": 0.60,
+    "disease_mild": 0.50,
+    "disease_moderate": 0.70,
+    "disease_high": 0.90,
+}
+# the alt model is consulted when max(probability) is below this
+DEFAULT_SECOND_OPINION_THRESHOLD = 0.70
+
+# direction each cut may move from its default without flagging fewer patients (+1 up, -1 down)
+SAFE_DIRECTION = {
+    "disease_moderate": -1,           # lower edge -> more Moderate
+    "disease_high": -1,               # lower edge -> more High
+    "healthy_low": +1,                # higher edge -> fewer Low
+    "healthy_medium": +1,             # higher edge -> fewer Medium, more Borderline
+    "second_opinion_threshold": +1,   # higher cut -> alt model consulted more often
+}
+
+DEFAULT_TARGETS = {
+    "high_precision": 0.95,       # P(disease | disease_prob >= disease_high)
+    "moderate_precision": 0.85,   # P(disease | disease_prob >= disease_moderate)
+    "low_npv": 0.95,              # P(healthy | healthy_prob > healthy_low)
+    "medium_npv": 0.85,           # P(healthy | healthy_prob > healthy_medium)
+    "max_error_without_second_opinion": 0.05,
+    "cost_fn": 5.0,               # a missed disease case costs 5x a false alarm
+    "cost_fp": 1.0,
+    "min_support": 50,
+    "min_band_width": 0.05,       # keeps every label reachable on well-separated scores
+    "allow_less_conservative": 0,  # 1 = tuned cuts may move against SAFE_DIRECTION
+}
+
+
+# ---------------- Vectorised sweep ----------------
+def threshold_curves(y, p):
+    """
+    Confusion counts for the rule "disease if p >= t" at every distinct score t,
+    thresholds in descending order.
+    """
+    y = np.asarray(y).astype(np.int64)
+    p = np.asarray(p, dtype=float)
+    order = np.argsort(-p, kind="stable")
+    p_sorted = p[order]
+    tp = np.cumsum(y[order])
+    fp = np.arange(1, len(p_sorted) + 1) - tp
+    # last row of each run of equal scores = the cut just below that score
+    last = np.append(np.flatnonzero(np.diff(p_sorted)), len(p_sorted) - 1)
+    pos = int(tp[-1]) if len(tp) else 0
+    neg = len(p_sorted) - pos
+    tp, fp = tp[last], fp[last]
+    return {
+        "threshold": p_sorted[last],
+        "tp": tp,
+        "fp": fp,
+        "fn": pos - tp,
+        "tn": neg - fp,
+        "n": len(p_sorted),
+    }
+
+
+def _ratio(num, den):
+    return np.divide(num, den, out=np.full(len(num), np.nan), where=den > 0)
+
+
+def curve_metrics(curves, cost_fn=5.0, cost_fp=1.0):
+    tp, fp, fn, tn = curves["tp"], curves["fp"], curves["fn"], curves["tn"]
+    return {
+        "threshold": curves["threshold"],
+        "precision": _ratio(tp, tp + fp),
+        "recall": _ratio(tp, tp + fn),
+        "specificity": _ratio(tn, tn + fp),
+        "npv": _ratio(tn, tn + fn),
+        "cost": (cost_fn * fn + cost_fp * fp) / max(1, curves["n"]),
+        "support_pos": tp + fp,   # rows at or above the threshold
+        "support_neg": tn + fn,   # rows below it
+    }
+
+
+def _lowest_threshold_with_precision(m, target, min_support, floor):
+    # stricter = higher threshold = lower index; thin tops are ignored
+    prec = np.where(m["support_pos"] >= min_support, m["precision"], np.inf)
+    ok = np.flatnonzero((np.minimum.accumulate(prec) >= target) & (m["threshold"] >= floor)
+                        & np.isfinite(prec))
+    return float(m["threshold"][ok[-1]]) if len(ok) else None
+
+
+def _highest_cut_with_npv(m, target, min_support, ceiling):
+    # stricter = lower cut = higher index
+    npv = np.where(m["support_neg"] >= min_support, m["npv"], np.inf)
+    run = np.minimum.accumulate(npv[::-1])[::-1]
+    ok = np.flatnonzero((run >= target) & (m["threshold"] <= ceiling) & np.isfinite(npv))
+    return float(m["threshold"][ok[0]]) if len(ok) else None
+
+
+def second_opinion_threshold(y, p, max_error, min_support):
+    """
+    Lowest confidence s such that the primary model's error rate on rows with
+    max(p, 1-p) >= s (the ones that skip the alt model) stays <= max_error.
+    """
+    y = np.asarray(y).astype(np.int64)
+    p = np.asarray(p, dtype=float)
+    conf = np.maximum(p, 1.0 - p)
+    wrong = ((p > 0.5).astype(np.int64) != y).astype(np.int64)
+    order = np.argsort(-conf, kind="stable")
+    c_sorted = conf[order]
+    err = np.cumsum(wrong[order])
+    count = np.arange(1, len(c_sorted) + 1)
+    last = np.append(np.flatnonzero(np.diff(c_sorted)), len(c_sorted) - 1)
+    rate = np.where(count[last] >= min_support, err[last] / count[last], -np.inf)
+    ok = np.flatnonzero((np.maximum.accumulate(rate) <= max_error) & (count[last] >= min_support))
+    if not len(ok):
+        return None, None
+    i = ok[-1]
+    return float(c_sorted[last[i]]), float(1.0 - count[last[i]] / len(c_sorted))
+
+
+def _safe_side(key, value, default, notes):
+    if (value - default) * SAFE_DIRECTION[key] < 0:
+        notes.append(f"{key}: tuned {value:.4f} is less conservative than the default, default kept")
+        return default
+    return value
+
+
+def recommend_cutpoints(y, p, targets=None):
+    t = dict(DEFAULT_TARGETS, **(targets or {}))
+    support = int(t["min_support"])
+    m = curve_metrics(threshold_curves(y, p), t["cost_fn"], t["cost_fp"])
+    bands = dict(DEFAULT_RISK_BANDS)
+    notes = []
+
+    mild = bands["disease_mild"]
+    high = _lowest_threshold_with_precision(m, t["high_precision"], support, mild)
+    moderate = _lowest_threshold_with_precision(m, t["moderate_precision"], support, mild)
+    if high is not None:
+        bands["disease_high"] = high
+    else:
+        notes.append("disease_high: precision target not reached, default kept")
+    if moderate is not None:
+        bands["disease_moderate"] = min(moderate, bands["disease_high"])
+    else:
+        notes.append("disease_moderate: precision target not reached, default kept")
+
+    # healthy side: healthy_prob > edge  <=>  disease_prob < 1 - edge
+    low_cut = _highest_cut_with_npv(m, t["low_npv"], support, mild)
+    medium_cut = _highest_cut_with_npv(m, t["medium_npv"], support, mild)
+    if low_cut is not None:
+        bands["healthy_low"] = 1.0 - low_cut
+    else:
+        notes.append("healthy_low: NPV target not reached, default kept")
+    if medium_cut is not None:
+        bands["healthy_medium"] = min(1.0 - medium_cut, bands["healthy_low"])
+    else:
+        notes.append("healthy_medium: NPV target not reached, default kept")
+
+    allow_unsafe = bool(t["allow_less_conservative"])
+    if not allow_unsafe:
+        for key in ("disease_high", "disease_moderate", "healthy_low", "healthy_medium"):
+            bands[key] = _safe_side(key, bands[key], DEFAULT_RISK_BANDS[key], notes)
+
+    # a model that already meets a target at the decision boundary would empty the band below
+    w = float(t["min_band_width"])
+    widened = {
+        "disease_moderate": max(bands["disease_moderate"], mild + w),
+        "healthy_medium": max(bands["healthy_medium"], 1.0 - mild + w),
+    }
+    widened["disease_high"] = max(bands["disease_high"], widened["disease_moderate"] + w)
+    widened["healthy_low"] = max(bands["healthy_low"], widened["healthy_medium"] + w)
+    for key, value in widened.items():
+        if value > bands[key]:
+            notes.append(f"{key}: widened to min_band_width")
+        bands[key] = min(value, 1.0)
+
+    second, consulted = second_opinion_threshold(y, p, t["max_error_without_second_opinion"], support)
+    if second is None:
+        second = DEFAULT_SECOND_OPINION_THRESHOLD
+        notes.append("second_opinion_threshold: error target not reached, default kept")
+    elif not allow_unsafe:
+        second = _safe_side("second_opinion_threshold", second, DEFAULT_SECOND_OPINION_THRESHOLD, notes)
+    if len(p):
+        p_arr = np.asarray(p, dtype=float)
+        consulted = float(np.mean(np.maximum(p_arr, 1.0 - p_arr) < second))
+
+    best = int(np.argmin(m["cost"]))
+    at_half = int(np.searchsorted(-m["threshold"], -0.5, side="right")) - 1
+    return {
+        "risk_bands": {k: round(float(v), 6) for k, v in bands.items()},
+        "second_opinion_threshold": round(float(second), 6),
+        "second_opinion_fraction": round(consulted, 6) if consulted is not None else None,
+        # informational: app.py still predicts by argmax (0.5)
+        "decision_threshold_min_cost": float(m["threshold"][best]),
+        "cost_at_min": float(m["cost"][best]),
+        "cost_at_0.5": float(m["cost"][at_half]) if at_half >= 0 else None,
+        "targets": t,
+        "notes": notes,
+    }, m
+
+
+def downsample_curves(m, points=200):
+    idx = np.unique(np.linspace(0, len(m["threshold"]) - 1, min(points, len(m["threshold"]))).astype(int))
+    keys = ("threshold", "precision", "recall", "specificity", "npv", "cost")
+    return {k: [None if np.isnan(v) else round(float(v), 6) for v in m[k][idx]] for k in keys}
+
+
+# ---------------- Tuning split ----------------
+def row_hashes(X):
+    """One uint64 per row over the feature values (DataFrame or 2-D array)."""
+    return pd.util.hash_pandas_object(pd.DataFrame(np.asarray(X, dtype=float)), index=False).to_numpy()
+
+
+def unseen_rows(X, seen_hashes):
+    """Boolean mask of the rows of X whose features do not occur in `seen_hashes`."""
+    return ~np.isin(row_hashes(X), seen_hashes)
+
+
+# ---------------- Artifacts ----------------
+def save_oos_scores(path, y, p):
+    np.savez(path, y=np.asarray(y).astype(np.int8), p=np.asarray(p, dtype=float))
+    return path
+
+
+def tune_thresholds(y, p, output_dir, targets=None, source=""):
+    """Sweep, recommend and write thresholds.json + thresholds_curves.png; returns the result."""
+    from training.report import save_threshold_curves
+
+    t0 = time.perf_counter()
+    result, m = recommend_cutpoints(y, p, targets)
+    result["source"] = source
+    result["n_scores"] = int(len(np.asarray(p)))
+    result["sweep_seconds"] = round(time.perf_counter() - t0, 3)
+    result["curves"] = downsample_curves(m)
+    with open(os.path.join(output_dir, "thresholds.json"), "w") as f:
+        json.dump(result, f, indent=2)
+    save_threshold_curves(result["curves"], result["risk_bands"], os.path.join(output_dir, "thresholds_curves.png"))
+    return result
+
+
+def load_thresholds(path):
+    """(risk_bands, second_opinion_threshold) from thresholds.json, else the defaults."""
+    bands = dict(DEFAULT_RISK_BANDS)
+    second = DEFAULT_SECOND_OPINION_THRESHOLD
+    if path and os.path.exists(path):
+        with open(path) as f:
+            tuned = json.load(f)
+        bands.update({k: float(v) for k, v in tuned.get("risk_bands", {}).items() if k in bands})
+        second = float(tuned.get("second_opinion_threshold", second))
+    return bands, second
+
+
+def matches_defaults(result):
+    """True if tuning ended on the built-in bands and second-opinion cut (nothing changed)."""
+    bands, second = result["risk_bands"], result["second_opinion_threshold"]
+    return (all(np.isclose(bands[k], v) for k, v in DEFAULT_RISK_BANDS.items())
+            and np.isclose(second, DEFAULT_SECOND_OPINION_THRESHOLD))
+
+
+def print_summary(result):
+    print(f"   Swept {result['n_scores']} scores in {result['sweep_seconds']}s")
+    print("   Risk bands:", result["risk_bands"])
+    consulted = result["second_opinion_fraction"]
+    print(f"   Second-opinion threshold: {result['second_opinion_threshold']:.4f}"
+          + (f" (alt model consulted for {consulted * 100:.1f}% of rows)" if consulted is not None else ""))
+    print(f"   Min-cost decision threshold: {result['decision_threshold_min_cost']:.4f} "
+          f"(cost {result['cost_at_min']:.4f} vs {result['cost_at_0.5']} at 0.5)")
+    for note in result["notes"]:
+        print("   ⚠", note)
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Tune LiverCare risk bands from out-of-sample scores.")
+    ap.add_argument("scores", help="npz with arrays y and p (liver_train.py writes oos_scores.npz)")
+    ap.add_argument("--out", default=None, help="output directory (default: next to the scores)")
+    ap.add_argument("--target", action="append", default=[], metavar="KEY=VALUE",
+                    help=f"override a target, keys: {', '.join(DEFAULT_TARGETS)}")
+    args = ap.parse_args(argv)
+
+    targets = {}
+    for item in args.target:
+        key, _, value = item.partition("=")
+        if key not in DEFAULT_TARGETS:
+            ap.error(f"unknown target {key!r}")
+        targets[key] = float(value)
+    data = np.load(args.scores)
+    out = args.out or os.path.dirname(os.path.abspath(args.scores))
+    result = tune_thresholds(data["y"], data["p"], out, targets, source=os.path.basename(args.scores))
+    print_summary(result)
+    print("Saved:", os.path.join(out, "thresholds.json"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())